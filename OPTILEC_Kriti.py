@@ -1,21 +1,26 @@
 import json
+import logging
 import re
 import os
 import glob
 import sys
-import subprocess
 from datetime import datetime
 
+import keys_index
+from content_index import ContentIndex, normalize_aliases
+import spec_engine
+import applog
+
+logger = logging.getLogger(__name__)
+param_log = applog.param_logger(__name__)
+
 # === CONFIG ===
 CURRENT_DIR = os.getcwd()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 json_dir = os.path.join(CURRENT_DIR, "output")
-keys_file = os.path.join(CURRENT_DIR, "keys.txt")
-specs_file = os.path.join(CURRENT_DIR, "specs", "LECITHIN.txt")
-
-# Create directories if they don't exist
-os.makedirs(json_dir, exist_ok=True)
-os.makedirs(os.path.dirname(specs_file), exist_ok=True)
+keys_file = os.path.join(BASE_DIR, "keys.txt")
+specs_file = os.path.join(BASE_DIR, "specs", "LECITHIN.txt")
 
 # Parameters considered for compliance
 compliance_keys = [
@@ -41,65 +46,27 @@ param_aliases = {
     "yeast_and_mold": ["yeastandmoulds"],
 }
 
-# === FIND JSON FILE ===
-if len(sys.argv) > 1:
-    json_file = sys.argv[1]
-else:
-    json_files = glob.glob(os.path.join(json_dir, "*.json"))
-    if not json_files:
-        raise FileNotFoundError(f"No JSON files found in {json_dir}")
-    json_file = json_files[0]
-
-print(f"Using JSON file: {json_file}")
-
-# === LOAD JSON ===
-with open(json_file, "r", encoding="utf-8") as f:
-    data = json.load(f)
-content = data.get("content", {})
-
-# === DETECT PRODUCT & COMPANY ===
-product_name = (content.get("product_name") or content.get("product") or "").strip()
-company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
-print("Detected product:", product_name)
-print("Detected company:", company_name)
-
 # === LOAD KEYS FROM FILE ===
-raw_keys = []
 product_keywords = ["Lecithin", "Whey", "SMP", "Permeate", "Casein"]
-dynamic_product = next((kw for kw in product_keywords if kw.lower() in product_name.lower()), product_name.split()[0] if product_name else "")
-if dynamic_product == "Optilec" or dynamic_product == "OPTILEC" or dynamic_product == "OPTILECC" or dynamic_product == "optilecc":
-    dynamic_product = "LECITHIN"
-dynamic_company = company_name.split()[0] if company_name else ""
-product_company_key = f"{dynamic_product}_{dynamic_company}".replace(" ", "_").replace("-", "_").lower()
-
-if os.path.exists(keys_file):
-    with open(keys_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if "- Mandatory Values -" not in line:
-                continue
-            product_part, keys_part = line.split("- Mandatory Values -", 1)
-            product_part_norm = product_part.strip().strip('"').replace(" ", "_").replace("-", "_").lower()
-            keys_match = re.search(r"\{(.*?)\}", keys_part)
-            keys_list = [k.strip().strip('"').strip("'") for k in keys_match.group(1).split(",")] if keys_match else []
-            if product_part_norm == product_company_key:
-                raw_keys = keys_list
-                break
-
-print(f"Dynamic keywords: Product='{dynamic_product}', Company='{dynamic_company}'")
-print("Keys of Interest:", raw_keys)
+
+def get_dynamic_keywords(product_name, company_name):
+    dynamic_product = next((kw for kw in product_keywords if kw.lower() in product_name.lower()), product_name.split()[0] if product_name else "")
+    if dynamic_product == "Optilec" or dynamic_product == "OPTILEC" or dynamic_product == "OPTILECC" or dynamic_product == "optilecc":
+        dynamic_product = "LECITHIN"
+    dynamic_company = company_name.split()[0] if company_name else ""
+    return dynamic_product, dynamic_company
+
+def load_keys(product_company_key):
+    # O(1) lookup in the keys.txt index, reloaded when the file changes
+    return keys_index.get_mandatory_keys(keys_file, product_company_key)
 
 # === LOAD SPECS FROM LECITHIN.txt ===
-specs_dict = {}
-if os.path.exists(specs_file):
-    with open(specs_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line and "|" in line:
-                parts = line.split("|", 1)
-                if len(parts) == 2:
-                    key = re.sub(r"[^a-z0-9]", "", parts[0].strip().lower())
-                    specs_dict[key] = parts[1].strip()
-    print(f"Loaded {len(specs_dict)} specs from {specs_file}")
+def load_specs():
+    # Compiled once per file change and shared by every document
+    specs_dict = spec_engine.load_specs(specs_file, parse_interval)
+    if specs_dict:
+        logger.debug("Loaded %d specs from %s", len(specs_dict), specs_file)
+    return specs_dict
 
 # === HELPER FUNCTIONS ===
 def normalize_text(s):
@@ -158,31 +125,35 @@ def interval_within(result_int, spec_int):
 
     return True, "Within Spec"
 
-def check_or_specs(result_int, spec_value):
-    if " OR " not in spec_value.upper():
-        spec_int = parse_interval(spec_value, is_spec=True)
-        return interval_within(result_int, spec_int)
+def check_or_specs(result_int, spec):
+    if not spec["or"]:
+        return interval_within(result_int, spec["alternatives"][0]["interval"])
     
-    or_parts = re.split(r'\s+OR\s+', spec_value, flags=re.IGNORECASE)
-    for spec_part in or_parts:
-        spec_int = parse_interval(spec_part.strip(), is_spec=True)
-        is_compliant, reason = interval_within(result_int, spec_int)
+    for alt in spec["alternatives"]:
+        is_compliant, reason = interval_within(result_int, alt["interval"])
         if is_compliant:
-            return True, f"Within Spec (matched: {spec_part.strip()})"
+            return True, f"Within Spec (matched: {alt['text']})"
     
     return False, f"Does not match any OR condition"
 
-def get_result(key):
+alias_norms = normalize_aliases(param_aliases)
+
+def find_result(index, key):
+    content = index.content
     key_norm = normalize_text(key)
-    aliases = param_aliases.get(key, [key])
-    for k in content.keys():
-        k_norm = normalize_text(k)
-        if k_norm.endswith("result"):
-            if key_norm in k_norm or any(normalize_text(alias) in k_norm for alias in aliases):
-                return content[k]
+    aliases = alias_norms.get(key, [key_norm])
+    for k, k_norm in index.result_keys:
+        if key_norm in k_norm or any(alias in k_norm for alias in aliases):
+            return content[k]
     return None
 
-def get_spec(key):
+def get_result(index, key):
+    # Each parameter is resolved once per document
+    if key not in index.results:
+        index.results[key] = find_result(index, key)
+    return index.results[key]
+
+def get_spec(specs_dict, key):
     key_norm = normalize_text(key)
     if key_norm in specs_dict:
         return specs_dict[key_norm]
@@ -196,25 +167,49 @@ def get_spec(key):
             return specs_dict[spec_key]
     return None
 
-# === HTML REPORT ===
-# Make sure LECITHIN_Kriti folder exists inside output
-# report_dir = os.path.join(os.path.dirname(json_file), "LECITHIN_Kriti")
-# os.makedirs(report_dir, exist_ok=True)
-
-# # Create report filename (same base name as JSON, but with _report.html)
-# json_name = os.path.splitext(os.path.basename(json_file))[0]
-# output_file = os.path.join(report_dir, f"{json_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html")
-output_file = os.path.splitext(json_file)[0] + f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html"
-with open(output_file, "w", encoding="utf-8") as out:
-    out.write("<html><body>\n")
-    out.write(f"<h1>Lab Report for {product_name} ({company_name})</h1>\n")
-    out.write("<table border='1' cellspacing='0' cellpadding='5'>\n")
-    out.write("<tr><th>Parameter</th><th>Result</th><th>Spec</th><th>Status</th></tr>\n")
-
+# === EVALUATE ===
+def resolve(content):
+    """
+    Identify the product/company of one COA and look up the OCR result and
+    compiled spec of every mandatory parameter, without judging them.
+    """
+    product_name = (content.get("product_name") or content.get("product") or "").strip()
+    company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
+    logger.info("Detected product: %s | company: %s", product_name, company_name)
+
+    dynamic_product, dynamic_company = get_dynamic_keywords(product_name, company_name)
+    product_company_key = f"{dynamic_product}_{dynamic_company}".replace(" ", "_").replace("-", "_").lower()
+    raw_keys = load_keys(product_company_key)
+
+    logger.debug("Dynamic keywords: Product='%s', Company='%s'", dynamic_product, dynamic_company)
+    logger.debug("Keys of Interest: %s", raw_keys)
+    specs_dict = load_specs()
+
+    # Normalize the document once; every parameter lookup resolves against it
+    index = ContentIndex(content)
+    params = [(key, get_result(index, key), get_spec(specs_dict, key)) for key in raw_keys]
+
+    return {
+        "product_name": product_name,
+        "company_name": company_name,
+        "keys": raw_keys,
+        "params": params,
+    }
+
+def evaluate(content):
+    """
+    Check every mandatory parameter of one COA against LECITHIN.txt.
+    Returns the product/company, the keys used and one row per parameter.
+    """
+    resolved = resolve(content)
+    product_name, company_name = resolved["product_name"], resolved["company_name"]
+    raw_keys = resolved["keys"]
+    rows = []
     non_compliant_found = False
-    for key in raw_keys:
-        raw_result = get_result(key)
-        raw_spec = get_spec(key)
+
+    for key, raw_result, spec in resolved["params"]:
+        raw_spec = spec["raw"] if spec else None
+
         raw_result_str = str(raw_result).strip() if raw_result is not None else "-"
         raw_spec_str = str(raw_spec).strip() if raw_spec is not None else "-"
 
@@ -225,34 +220,93 @@ with open(output_file, "w", encoding="utf-8") as out:
             is_compliant = False
             reason = "Missing result or spec"
         else:
-            is_compliant, reason = check_or_specs(res_int, raw_spec)
+            is_compliant, reason = check_or_specs(res_int, spec)
             status = "Within Spec" if is_compliant else "Exceeds Spec"
             color = "green" if is_compliant else "red"
 
         if key in compliance_keys and not is_compliant:
             non_compliant_found = True
 
-        out.write(f"<tr>")
-        out.write(f"<td>{key}</td><td>{raw_result_str}</td><td>{raw_spec_str}</td>")
-        if key in compliance_keys:
-            out.write(f"<td style='color:{color}; font-weight:bold'>{status}")
+        rows.append({
+            "parameter": key,
+            "result": raw_result_str,
+            "spec": raw_spec_str,
+            "status": status,
+            "reason": reason,
+            "color": color,
+            "within_spec": is_compliant,
+            "compliance_key": key in compliance_keys,
+        })
+
+    return {
+        "product_name": product_name,
+        "company_name": company_name,
+        "keys": raw_keys,
+        "rows": rows,
+        "non_compliant": non_compliant_found,
+    }
+
+# === HTML REPORT ===
+def write_report(evaluation, json_file):
+    # Make sure OPTILEC_Kriti folder exists inside output
+    # report_dir = os.path.join(os.path.dirname(json_file), "OPTILEC_Kriti")
+    # os.makedirs(report_dir, exist_ok=True)
+
+    # # Create report filename (same base name as JSON, but with _report.html)
+    # json_name = os.path.splitext(os.path.basename(json_file))[0]
+    # output_file = os.path.join(report_dir, f"{json_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html")
+    output_file = os.path.splitext(json_file)[0] + f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html"
+    with open(output_file, "w", encoding="utf-8") as out:
+        out.write("<html><body>\n")
+        out.write(f"<h1>Lab Report for {evaluation['product_name']} ({evaluation['company_name']})</h1>\n")
+        out.write("<table border='1' cellspacing='0' cellpadding='5'>\n")
+        out.write("<tr><th>Parameter</th><th>Result</th><th>Spec</th><th>Status</th></tr>\n")
+
+        for row in evaluation["rows"]:
+            out.write(f"<tr>")
+            out.write(f"<td>{row['parameter']}</td><td>{row['result']}</td><td>{row['spec']}</td>")
+            if row["compliance_key"]:
+                out.write(f"<td style='color:{row['color']}; font-weight:bold'>{row['status']}")
+            else:
+                out.write(f"<td>{row['status']}")
+            if row["reason"] and row["status"] != "Within Spec":
+                out.write(f"<br><small>Reason: {row['reason']}</small>")
+            out.write("</td></tr>\n")
+
+        out.write("</table>\n")
+        if evaluation["non_compliant"]:
+            out.write(f"<h3 style='color:red'>This report has Non-Compliance (based on selected parameters)</h3>\n")
         else:
-            out.write(f"<td>{status}")
-        if reason and status != "Within Spec":
-            out.write(f"<br><small>Reason: {reason}</small>")
-        out.write("</td></tr>\n")
-
-    out.write("</table>\n")
-    if non_compliant_found:
-        out.write(f"<h3 style='color:red'>This report has Non-Compliance (based on selected parameters)</h3>\n")
+            out.write(f"<h3 style='color:green'>This report is Fully compliant (based on selected parameters)</h3>\n")
+        out.write("</body></html>\n")
+
+    logger.info("Report written to: %s", output_file)
+    return output_file
+
+# === RUN ===
+def run(json_file):
+    """
+    Evaluate one saved Nanonets JSON file and write its HTML report.
+    Returns the evaluation with the report path under "report_path".
+    """
+    logger.debug("Using JSON file: %s", json_file)
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    content = data.get("content", {})
+
+    evaluation = evaluate(content)
+    evaluation["report_path"] = write_report(evaluation, json_file)
+
+    return evaluation
+
+if __name__ == "__main__":
+    applog.setup()
+    os.makedirs(json_dir, exist_ok=True)
+    if len(sys.argv) > 1:
+        json_file = sys.argv[1]
     else:
-        out.write(f"<h3 style='color:green'>This report is Fully compliant (based on selected parameters)</h3>\n")
-    out.write("</body></html>\n")
-
-print(f"\nReport written to: {output_file}")
-# === RUN CLEANUP SCRIPT ===
-try:
-    subprocess.run(["python", "cleanup_files.py"], check=True)
-    print("cleanup_files.py executed successfully.")
-except Exception as e:
-    print(f"Error running cleanup_files.py: {e}")
+        json_files = glob.glob(os.path.join(json_dir, "*.json"))
+        if not json_files:
+            raise FileNotFoundError(f"No JSON files found in {json_dir}")
+        json_file = json_files[0]
+    run(json_file)
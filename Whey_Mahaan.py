@@ -1,21 +1,26 @@
 import json
+import logging
 import re
 import os
 import glob
 import sys
-import subprocess
 from datetime import datetime
 
+import keys_index
+from content_index import ContentIndex, normalize_aliases
+import spec_engine
+import applog
+
+logger = logging.getLogger(__name__)
+param_log = applog.param_logger(__name__)
+
 # === CONFIG ===
 CURRENT_DIR = os.getcwd()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 json_dir = os.path.join(CURRENT_DIR, "output")
-keys_file = os.path.join(CURRENT_DIR, "keys.txt")
-specs_file = os.path.join(CURRENT_DIR, "specs", "WHEY.txt")
-
-# Create directories if they don't exist
-os.makedirs(json_dir, exist_ok=True)
-os.makedirs(os.path.dirname(specs_file), exist_ok=True)
+keys_file = os.path.join(BASE_DIR, "keys.txt")
+specs_file = os.path.join(BASE_DIR, "specs", "WHEY.txt")
 
 compliance_keys = [
     "moisture", "total_plate_count", "enterobacteriaceae", "salmonella", "yeast_and_mold"
@@ -47,51 +52,25 @@ param_aliases = {
     "b_cereus": ["bcereus"]
 }
 
-# === FIND JSON FILE ===
-json_file = sys.argv[1] if len(sys.argv) > 1 else glob.glob(os.path.join(json_dir, "*.json"))[0]
-print(f"Using JSON file: {json_file}")
-
-# === LOAD JSON ===
-with open(json_file, "r", encoding="utf-8") as f:
-    content = json.load(f).get("content", {})
-
-# === DETECT PRODUCT & COMPANY ===
-product_name = (content.get("product_name") or content.get("product") or "").strip()
-company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
-print(f"Product: {product_name} | Company: {company_name}")
-
 # === LOAD KEYS ===
-raw_keys = []
 product_keywords = ["Whey", "Lecithin", "SMP", "Permeate", "Casein"]
-dynamic_product = next((kw for kw in product_keywords if kw.lower() in product_name.lower()), product_name.split()[0] if product_name else "")
-dynamic_company = company_name.split()[0] if company_name else ""
-product_company_key = f"{dynamic_product}_{dynamic_company}".replace(" ", "_").replace("-", "_").lower()
-
-if os.path.exists(keys_file):
-    with open(keys_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if "- Mandatory Values -" not in line:
-                continue
-            product_part, keys_part = line.split("- Mandatory Values -", 1)
-            product_part_norm = product_part.strip().strip('"').replace(" ", "_").replace("-", "_").lower()
-            keys_match = re.search(r"\{(.*?)\}", keys_part)
-            keys_list = [k.strip().strip('"').strip("'") for k in keys_match.group(1).split(",")] if keys_match else []
-            if product_part_norm == product_company_key:
-                raw_keys = keys_list
-                break
-
-print(f"Keys: {raw_keys}")
+
+def get_product_company_key(product_name, company_name):
+    dynamic_product = next((kw for kw in product_keywords if kw.lower() in product_name.lower()), product_name.split()[0] if product_name else "")
+    dynamic_company = company_name.split()[0] if company_name else ""
+    return f"{dynamic_product}_{dynamic_company}".replace(" ", "_").replace("-", "_").lower()
+
+def load_keys(product_company_key):
+    # O(1) lookup in the keys.txt index, reloaded when the file changes
+    return keys_index.get_mandatory_keys(keys_file, product_company_key)
 
 # === LOAD SPECS ===
-specs_dict = {}
-if os.path.exists(specs_file):
-    with open(specs_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip() and "|" in line:
-                parts = line.strip().split("|", 1)
-                if len(parts) == 2:
-                    specs_dict[re.sub(r"[^a-z0-9]", "", parts[0].lower())] = parts[1].strip()
-    print(f"Loaded {len(specs_dict)} specs")
+def load_specs():
+    # Compiled once per file change and shared by every document
+    specs_dict = spec_engine.load_specs(specs_file, parse_interval)
+    if specs_dict:
+        logger.debug("Loaded %d specs", len(specs_dict))
+    return specs_dict
 
 # === HELPERS ===
 def normalize(s):
@@ -125,9 +104,12 @@ def parse_interval(value, is_spec=False):
 
     return None
 
+# Parameters compared as text rather than by numeric limits
+textual_keys = ["colour_appearance", "taste_flavour", "scorched_particles", "appearance", "color", "taste", "flavour"]
+
 def check_compliance(result_int, spec_int, raw_result, raw_spec, key):
     # Textual parameters
-    if key.lower() in ["colour_appearance", "taste_flavour", "scorched_particles", "appearance", "color", "taste", "flavour"]:
+    if key.lower() in textual_keys:
         if raw_result and raw_spec:
             r, s = str(raw_result).lower(), str(raw_spec).lower()
             if r in s or s in r or any(w in s for w in r.split()) or r in ["complies", "fine", "ok", "acceptable"]:
@@ -151,71 +133,65 @@ def check_compliance(result_int, spec_int, raw_result, raw_spec, key):
 
     return True, "Within Spec"
 
-def check_or_specs(result_int, spec_value, raw_result, key):
-    if " OR " not in spec_value.upper():
-        spec_int = parse_interval(spec_value, is_spec=True)
-        return check_compliance(result_int, spec_int, raw_result, spec_value, key)
+def check_or_specs(result_int, spec, raw_result, key):
+    if not spec["or"]:
+        alt = spec["alternatives"][0]
+        return check_compliance(result_int, alt["interval"], raw_result, alt["text"], key)
     
-    for spec_part in re.split(r'\s+OR\s+', spec_value, flags=re.IGNORECASE):
-        spec_int = parse_interval(spec_part.strip(), is_spec=True)
-        is_ok, _ = check_compliance(result_int, spec_int, raw_result, spec_part.strip(), key)
+    for alt in spec["alternatives"]:
+        is_ok, _ = check_compliance(result_int, alt["interval"], raw_result, alt["text"], key)
         if is_ok:
-            return True, f"Within Spec (matched: {spec_part.strip()})"
+            return True, f"Within Spec (matched: {alt['text']})"
     
     return False, "Does not match any OR condition"
 
-def get_result(key):
+alias_norms = normalize_aliases(param_aliases)
+characteristic_slots = [("characteristic_{}_name", "characteristic_{}_result")]
+
+def find_result(index, key):
+    content = index.content
     key_norm = normalize(key)
-    aliases = [normalize(a) for a in param_aliases.get(key, [key])]
-    all_matches = [key_norm] + aliases
+    all_matches = [key_norm] + alias_norms.get(key, [key_norm])
     
     # Strategy 1: Try characteristic_X_name pattern (Mahaan format)
-    for i in range(1, 25):
-        name_key = f"characteristic_{i}_name"
-        result_key = f"characteristic_{i}_result"
-        
-        param_val = content.get(name_key)
-        if not param_val:
-            continue
-        
-        param_norm = normalize(param_val)
-        
+    for name_key, param_val, param_norm, result_key in index.name_slots(characteristic_slots):
         # Check if this matches our key or any alias
         for match in all_matches:
             if match == param_norm or match in param_norm or param_norm in match:
                 result = content.get(result_key)
                 if result:
-                    print(f"  Found (characteristic): {name_key}='{param_val}' -> {result}")
+                    param_log.debug("Found (characteristic): %s='%s' -> %s", name_key, param_val, result)
                     return result
     
     # Strategy 2: Try prefix_key_result pattern (alternative format)
     prefixes = ["physical", "chemical", "microbiological"]
     for prefix in prefixes:
         for match in all_matches:
-            result_key_pattern = f"{prefix}_{match}_result"
-            
-            for k in content.keys():
-                if normalize(k) == normalize(result_key_pattern):
-                    result = content[k]
-                    if result:
-                        print(f"  Found (prefix): {k} -> {result}")
-                        return result
+            for k in index.keys_for_norm(normalize(f"{prefix}_{match}_result")):
+                result = content[k]
+                if result:
+                    param_log.debug("Found (prefix): %s -> %s", k, result)
+                    return result
     
     # Strategy 3: Broader search
-    for k in content.keys():
-        k_norm = normalize(k)
-        if k_norm.endswith("result"):
-            for match in all_matches:
-                if match in k_norm:
-                    result = content[k]
-                    if result:
-                        print(f"  Found (contains): {k} -> {result}")
-                        return result
+    for k, k_norm in index.result_keys:
+        for match in all_matches:
+            if match in k_norm:
+                result = content[k]
+                if result:
+                    param_log.debug("Found (contains): %s -> %s", k, result)
+                    return result
     
-    print(f"  NOT FOUND: {key}")
+    param_log.debug("NOT FOUND: %s", key)
     return None
 
-def get_spec(key):
+def get_result(index, key):
+    # Each parameter is resolved once per document
+    if key not in index.results:
+        index.results[key] = find_result(index, key)
+    return index.results[key]
+
+def get_spec(specs_dict, key):
     key_norm = normalize(key)
     
     if key_norm in specs_dict:
@@ -232,7 +208,7 @@ def get_spec(key):
     
     return None
 
-def get_salmonella_sample():
+def get_salmonella_sample(content):
     patterns = ["15x25 g", "5x75 g", "3x125 g", "375 g", "15x25g", "5x75g", "3x125g", "375g", "30x25g", "30x25 g"]
     
     # Check characteristic_X_uom and characteristic_X_name fields
@@ -265,28 +241,46 @@ def get_salmonella_sample():
     
     return None
 
-# === HTML REPORT ===
-# Make sure Whey_Mahaan folder exists inside output
-# report_dir = os.path.join(os.path.dirname(json_file), "Whey_Mahaan")
-# os.makedirs(report_dir, exist_ok=True)
-
-# # Create report filename (same base name as JSON, but with _report.html)
-# json_name = os.path.splitext(os.path.basename(json_file))[0]
-# output_file = os.path.join(report_dir, f"{json_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html")
-output_file = os.path.splitext(json_file)[0] + f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html"
-with open(output_file, "w", encoding="utf-8") as out:
-    out.write(f"<html><body>\n<h1>Lab Report: {product_name} ({company_name})</h1>\n")
-    #out.write(f"<p>JSON: {os.path.basename(json_file)} | Specs: {os.path.basename(specs_file)}</p>\n")
-    out.write("<table border='1' cellspacing='0' cellpadding='5'>\n")
-    out.write("<tr><th>Parameter</th><th>Result</th><th>Spec</th><th>Status</th></tr>\n")
-
+# === EVALUATE ===
+def resolve(content):
+    """
+    Identify the product/company of one COA and look up the OCR result and
+    compiled spec of every mandatory parameter, without judging them.
+    """
+    product_name = (content.get("product_name") or content.get("product") or "").strip()
+    company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
+    logger.info("Product: %s | Company: %s", product_name, company_name)
+
+    raw_keys = load_keys(get_product_company_key(product_name, company_name))
+    logger.debug("Keys: %s", raw_keys)
+    specs_dict = load_specs()
+
+    # Normalize the document once; every parameter lookup resolves against it
+    index = ContentIndex(content)
+    params = [(key, get_result(index, key), get_spec(specs_dict, key)) for key in raw_keys]
+
+    return {
+        "product_name": product_name,
+        "company_name": company_name,
+        "keys": raw_keys,
+        "params": params,
+    }
+
+def evaluate(content):
+    """
+    Check every mandatory parameter of one COA against WHEY.txt.
+    Returns the product/company, the keys used and one row per parameter.
+    """
+    resolved = resolve(content)
+    product_name, company_name = resolved["product_name"], resolved["company_name"]
+    raw_keys = resolved["keys"]
+    rows = []
     non_compliant = False
 
-    for key in raw_keys:
-        raw_result = get_result(key)
-        raw_spec = get_spec(key)
+    for key, raw_result, spec in resolved["params"]:
+        raw_spec = spec["raw"] if spec else None
 
-        sample = get_salmonella_sample() if "salmonella" in key.lower() else None
+        sample = get_salmonella_sample(content) if "salmonella" in key.lower() else None
         result_display = f"{raw_result} / {sample}" if sample and raw_result else (raw_result or "-")
         spec_display = raw_spec or "-"
 
@@ -296,28 +290,80 @@ with open(output_file, "w", encoding="utf-8") as out:
             status, color, reason = "Missing", ("red" if key in compliance_keys else "gray"), "Missing result or spec"
             is_ok = False
         else:
-            is_ok, reason = check_or_specs(result_int, raw_spec, raw_result, key)
+            is_ok, reason = check_or_specs(result_int, spec, raw_result, key)
             status, color = ("Within Spec", "green") if is_ok else ("Exceeds Spec", "red")
 
         if key in compliance_keys and not is_ok:
             non_compliant = True
 
-        out.write(f"<tr><td>{key}</td><td>{result_display}</td><td>{spec_display}</td>")
-        out.write(f"<td style='color:{color}{'; font-weight:bold' if key in compliance_keys else ''}'>{status}")
-        if not is_ok:
-            out.write(f"<br><small>{reason}</small>")
-        out.write("</td></tr>\n")
-
-    out.write("</table>\n")
-    status_msg = "Non-Compliance" if non_compliant else "Fully compliant"
-    status_color = "red" if non_compliant else "green"
-    out.write(f"<h3 style='color:{status_color}'>This report has {status_msg} (based on selected parameters)</h3>\n")
-    out.write("</body></html>\n")
-
-print(f"\nReport: {output_file}")
-# === RUN CLEANUP SCRIPT ===
-try:
-    subprocess.run(["python", "cleanup_files.py"], check=True)
-    print("cleanup_files.py executed successfully.")
-except Exception as e:
-    print(f"Error running cleanup_files.py: {e}")
\ No newline at end of file
+        rows.append({
+            "parameter": key,
+            "result": result_display,
+            "spec": spec_display,
+            "status": status,
+            "reason": reason,
+            "color": color,
+            "within_spec": is_ok,
+            "compliance_key": key in compliance_keys,
+        })
+
+    return {
+        "product_name": product_name,
+        "company_name": company_name,
+        "keys": raw_keys,
+        "rows": rows,
+        "non_compliant": non_compliant,
+    }
+
+# === HTML REPORT ===
+def write_report(evaluation, json_file):
+    # Make sure Whey_Mahaan folder exists inside output
+    # report_dir = os.path.join(os.path.dirname(json_file), "Whey_Mahaan")
+    # os.makedirs(report_dir, exist_ok=True)
+
+    # # Create report filename (same base name as JSON, but with _report.html)
+    # json_name = os.path.splitext(os.path.basename(json_file))[0]
+    # output_file = os.path.join(report_dir, f"{json_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html")
+    output_file = os.path.splitext(json_file)[0] + f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}_report.html"
+    with open(output_file, "w", encoding="utf-8") as out:
+        out.write(f"<html><body>\n<h1>Lab Report: {evaluation['product_name']} ({evaluation['company_name']})</h1>\n")
+        #out.write(f"<p>JSON: {os.path.basename(json_file)} | Specs: {os.path.basename(specs_file)}</p>\n")
+        out.write("<table border='1' cellspacing='0' cellpadding='5'>\n")
+        out.write("<tr><th>Parameter</th><th>Result</th><th>Spec</th><th>Status</th></tr>\n")
+
+        for row in evaluation["rows"]:
+            out.write(f"<tr><td>{row['parameter']}</td><td>{row['result']}</td><td>{row['spec']}</td>")
+            out.write(f"<td style='color:{row['color']}{'; font-weight:bold' if row['compliance_key'] else ''}'>{row['status']}")
+            if not row["within_spec"]:
+                out.write(f"<br><small>{row['reason']}</small>")
+            out.write("</td></tr>\n")
+
+        out.write("</table>\n")
+        status_msg = "Non-Compliance" if evaluation["non_compliant"] else "Fully compliant"
+        status_color = "red" if evaluation["non_compliant"] else "green"
+        out.write(f"<h3 style='color:{status_color}'>This report has {status_msg} (based on selected parameters)</h3>\n")
+        out.write("</body></html>\n")
+
+    logger.info("Report: %s", output_file)
+    return output_file
+
+# === RUN ===
+def run(json_file):
+    """
+    Evaluate one saved Nanonets JSON file and write its HTML report.
+    Returns the evaluation with the report path under "report_path".
+    """
+    logger.debug("Using JSON file: %s", json_file)
+    with open(json_file, "r", encoding="utf-8") as f:
+        content = json.load(f).get("content", {})
+
+    evaluation = evaluate(content)
+    evaluation["report_path"] = write_report(evaluation, json_file)
+
+    return evaluation
+
+if __name__ == "__main__":
+    applog.setup()
+    os.makedirs(json_dir, exist_ok=True)
+    json_file = sys.argv[1] if len(sys.argv) > 1 else glob.glob(os.path.join(json_dir, "*.json"))[0]
+    run(json_file)
@@ -1,9 +1,24 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-import requests
-import json
+from fastapi.responses import JSONResponse
+from mangum import Mangum
+import contextlib
+import os
+import sys
 
-app = FastAPI()
+# Shared modules live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr_client
+import ocr_resilience
+import uploads
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await ocr_client.close_client()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS - allow your frontend
 app.add_middleware(
@@ -14,10 +29,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Nanonets config
-API_KEY = "dcc5b694-96c8-11f0-b983-1ad2fa14c17a"
-NANONETS_URL = "https://extraction-api.nanonets.com/extract"
-HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    if request.method == "POST" and uploads.content_length_too_large(request.headers):
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"File too large (limit {uploads.MAX_UPLOAD_BYTES} bytes)"}
+        )
+    return await call_next(request)
 
 @app.get("/")
 def read_root():
@@ -26,34 +45,16 @@ def read_root():
 @app.post("/upload-pdf/")
 async def upload_pdf(file: UploadFile = File(...)):
     """
-    Process PDF directly without saving to disk.
+    Process PDF through a size-bounded temp file; nothing is kept after the request.
     Calls Nanonets API and returns the result.
     """
+    pdf_path = None
     try:
-        # Read file content into memory
-        pdf_content = await file.read()
-        
-        # Send directly to Nanonets API
-        files = {"file": (file.filename, pdf_content, "application/pdf")}
-        data = {"output_type": "flat-json"}
+        # Spool to a temp file in chunks, then stream it to Nanonets
+        pdf_path, _, _ = await uploads.spool_upload(file)
         
-        response = requests.post(
-            NANONETS_URL, 
-            headers=HEADERS, 
-            files=files, 
-            data=data,
-            timeout=60
-        )
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        # Normalize content if needed
-        if "content" in result and isinstance(result["content"], str):
-            try:
-                result["content"] = json.loads(result["content"])
-            except json.JSONDecodeError:
-                pass
+        # Send directly to Nanonets API over the shared connection pool
+        result = await ocr_client.extract(file.filename, pdf_path)
         
         return {
             "success": True,
@@ -61,7 +62,18 @@ async def upload_pdf(file: UploadFile = File(...)):
             "data": result
         }
         
-    except requests.exceptions.RequestException as e:
+    except uploads.UploadTooLarge as e:
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"File too large: {str(e)}"}
+        )
+    except ocr_resilience.CircuitOpenError as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": e.retry_after_header},
+            content={"success": False, "error": f"Nanonets API unavailable: {str(e)}"}
+        )
+    except ocr_client.HTTPError as e:
         return {
             "success": False,
             "error": f"Nanonets API error: {str(e)}"
@@ -71,6 +83,9 @@ async def upload_pdf(file: UploadFile = File(...)):
             "success": False,
             "error": f"Processing error: {str(e)}"
         }
+    finally:
+        if pdf_path:
+            uploads.remove_spooled(pdf_path)
 
 @app.get("/health")
 def health_check():
@@ -0,0 +1,149 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+import zlib
+
+# === CONFIG ===
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for a human-readable line
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+# Share of requests whose per-parameter debug lines are kept (all or none per request)
+PARAM_SAMPLE_RATE = float(os.environ.get("LOG_PARAM_SAMPLE_RATE", "0.1"))
+
+# Correlation id of the request/job/PDF being handled; contextvars keep it per
+# asyncio task and per thread
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+# === CORRELATION IDS ===
+def new_request_id(request_id=None):
+    """Start a new correlation id for the current request (or adopt the caller's) and return it."""
+    request_id = request_id or uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    return request_id
+
+def set_request_id(request_id):
+    _request_id.set(request_id)
+
+def get_request_id():
+    return _request_id.get()
+
+# === FILTERS AND FORMATTERS ===
+class ContextFilter(logging.Filter):
+    """Stamp records with the correlation id while still on the caller's thread."""
+    def filter(self, record):
+        record.request_id = _request_id.get() or "-"
+        return True
+
+class ParamSampler(logging.Filter):
+    """
+    Keep per-parameter debug lines for PARAM_SAMPLE_RATE of the requests.
+    The decision hashes the correlation id, so a sampled request keeps all of
+    its lines; lines outside any request are always kept.
+    """
+    def __init__(self, rate=PARAM_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        request_id = _request_id.get()
+        if request_id is None or self.rate >= 1:
+            return True
+        return zlib.crc32(request_id.encode()) % 10000 < self.rate * 10000
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        # Records from the queue carry the traceback already formatted (exc_text)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler.prepare() folds the traceback into msg; this keeps it in
+    exc_text (tracebacks cannot cross the queue) so the formatter on the
+    listener thread can still emit it as its own field.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_param_sampler = ParamSampler()
+
+def param_logger(name):
+    """
+    Logger for one-line-per-parameter debug detail of a parser module.
+    Disabled below DEBUG, and sampled per request when enabled.
+    """
+    logger = logging.getLogger(f"{name}.params")
+    if _param_sampler not in logger.filters:
+        logger.addFilter(_param_sampler)
+    return logger
+
+# === SETUP ===
+def setup(level=None, fmt=None, stream=None):
+    """
+    Route the root logger through a QueueHandler so callers only enqueue
+    records; a background QueueListener thread formats and writes them.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if (fmt or LOG_FORMAT) == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
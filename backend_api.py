@@ -1,12 +1,53 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List
+import asyncio
+import contextlib
 import json
-import subprocess
+import logging
 import os
+import re
 import tempfile
+import time
+import uuid
+import zipfile
 
-app = FastAPI()
+import applog
+import jobs
+import local_extract
+import metrics
+import ocr_cache
+import ocr_client
+import ocr_resilience
+import parser_registry
+import pdf_shrink
+import progress
+import results_store
+import retention
+import single_flight
+import uploads
+
+applog.setup()
+logger = logging.getLogger(__name__)
+
+# Per-process services: job workers, retention sweeps and the databases.
+# Hosts that send no lifespan events (serverless bridges) run without them:
+# uploads still work, jobs are refused with 503 (see JOBS).
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    log_config()
+    results_store.init()
+    start_job_workers()
+    start_retention()
+    try:
+        yield
+    finally:
+        await stop_retention()
+        await stop_job_workers()
+        await ocr_client.close_client()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS - allow your frontend
 app.add_middleware(
@@ -21,156 +62,690 @@ app.add_middleware(
 TEMP_DIR = tempfile.gettempdir()
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 JSON_DIR = os.path.join(TEMP_DIR, "output")
-SPECS_DIR = os.path.join(TEMP_DIR, "specs")
 KEYS_FILE = os.path.join(CURRENT_DIR, "keys.txt")
 
-# Create directories if they don't exist
-os.makedirs(JSON_DIR, exist_ok=True)
-os.makedirs(SPECS_DIR, exist_ok=True)
+# Import is kept light: on Vercel every cold start pays for it before the
+# first byte. Beyond applog.setup() (which starts the log writer thread) it
+# does no I/O; supplier parsers (with their spec and keys indexes) load on
+# the first parser lookup, the Nanonets client and PyMuPDF with the first
+# upload, and directories are created by the code that writes to them.
 
-print(f"[STARTUP] CURRENT_DIR: {CURRENT_DIR}")
-print(f"[STARTUP] TEMP_DIR: {TEMP_DIR}")
-print(f"[STARTUP] JSON_DIR: {JSON_DIR}")
-print(f"[STARTUP] KEYS_FILE: {KEYS_FILE}")
+def log_config():
+    logger.info("Startup directories", extra={"current_dir": CURRENT_DIR, "temp_dir": TEMP_DIR, "json_dir": JSON_DIR, "keys_file": KEYS_FILE})
+    # Nanonets config lives in ocr_client (shared async client with pooled connections)
+    logger.info("Nanonets URL: %s", ocr_client.NANONETS_URL)
 
-# Nanonets config
-API_KEY = "dcc5b694-96c8-11f0-b983-1ad2fa14c17a"
-NANONETS_URL = "https://extraction-api.nanonets.com/extract"
-HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse before the multipart body is read when the size is declared up front
+    max_bytes = uploads.MAX_BATCH_BYTES if request.url.path.startswith("/upload-batch") else uploads.MAX_UPLOAD_BYTES
+    if request.method == "POST" and uploads.content_length_too_large(request.headers, max_bytes):
+        logger.warning("Rejected upload: Content-Length %s", request.headers.get('content-length'))
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"File too large (limit {max_bytes} bytes)"}
+        )
+    return await call_next(request)
 
 @app.get("/")
 def read_root():
-    print("[API] GET / called")
+    logger.debug("GET / called")
     return {"message": "FastAPI backend is running!", "status": "ok"}
 
-@app.post("/upload-pdf/")
-async def upload_pdf(file: UploadFile = File(...)):
+async def _extract(filename, pdf_path, timings):
+    """Local text layer or Nanonets for one uncached PDF; returns (result, backend)."""
+    # Digital PDFs are read from their own text layer; scans and
+    # low-confidence reads fall through to Nanonets
+    local_stage = time.perf_counter()
+    result = await asyncio.to_thread(local_extract.maybe_extract, pdf_path)
+    timings["local"] = time.perf_counter() - local_stage
+    if result is not None:
+        return result, "local"
+
+    # Optionally downsample oversized scans first; CPU work stays off the loop
+    shrink = await asyncio.to_thread(pdf_shrink.maybe_shrink, pdf_path)
+    timings["shrink"] = shrink["seconds"]
+    try:
+        # Stream the spooled file to Nanonets without blocking the event loop
+        logger.debug("Calling Nanonets API")
+        # A path lets the client reopen the file for retries and hedged requests
+        result = await ocr_client.extract(filename, shrink["path"])
+        logger.debug("Nanonets API success")
+    finally:
+        pdf_shrink.discard(shrink)
+    return result, "nanonets"
+
+# Concurrent uploads of identical bytes in this worker share one pipeline run
+_in_flight = single_flight.Group()
+
+async def run_pipeline(filename, pdf_path, pdf_digest):
     """
-    Process PDF using Nanonets API and optionally run parser.
+    OCR, parse and report one spooled PDF.
+    Returns (response dict, per-stage timings in seconds, parser name or
+    "none"); shared by the synchronous upload endpoint and the job workers.
+    An identical PDF already in flight in this worker is joined instead.
     """
+    started = time.perf_counter()
     try:
-        print(f"\n[API] POST /upload-pdf/ - Received file: {file.filename}")
-        print(f"[API] Content-Type: {file.content_type}")
-        
-        # Read file content into memory
-        pdf_content = await file.read()
-        print(f"[API] File size: {len(pdf_content)} bytes")
-        
-        # Send to Nanonets API
-        files = {"file": (file.filename, pdf_content, "application/pdf")}
-        data = {"output_type": "flat-json"}
-        
-        print(f"[API] Calling Nanonets API...")
-        response = requests.post(
-            NANONETS_URL, 
-            headers=HEADERS, 
-            files=files, 
-            data=data,
-            timeout=60
+        (response, timings, parser_label), shared = await _in_flight.do(
+            pdf_digest, _run_pipeline, filename, pdf_path, pdf_digest
         )
-        
-        print(f"[API] Nanonets response status: {response.status_code}")
-        response.raise_for_status()
-        result = response.json()
-        print(f"[API] Nanonets API success")
-        
-        # Normalize content if needed
-        if "content" in result and isinstance(result["content"], str):
-            try:
-                result["content"] = json.loads(result["content"])
-            except json.JSONDecodeError:
-                pass
-        
-        # Save JSON output
-        name_without_ext = os.path.splitext(file.filename)[0]
-        json_output_path = os.path.join(JSON_DIR, f"{name_without_ext}.json")
-        
+    except ocr_resilience.CircuitOpenError:
+        # The caller queues it (a "queued" or "deferred" event follows)
+        raise
+    except Exception as e:
+        progress.publish("failed", error=str(e))
+        raise
+
+    if shared:
+        metrics.SINGLE_FLIGHT_JOINED.inc(scope="process")
+        metrics.SINGLE_FLIGHT_WAIT.observe(time.perf_counter() - started, scope="process")
+        if response["ocrBackend"] == "nanonets":
+            metrics.SINGLE_FLIGHT_SAVED.inc(scope="process")
+        logger.info("Joined in-flight upload of identical PDF %s", pdf_digest[:12])
+        response = {**response, "filename": filename, "coalesced": True}
+    progress.publish("done", success=True, resultId=response["resultId"], ocrBackend=response["ocrBackend"],
+                     coalesced=response["coalesced"], seconds=time.perf_counter() - started)
+    return response, timings, parser_label
+
+def _release_spool(pdf_path, pdf_digest):
+    """
+    Remove a spooled upload. A cancelled leader's pipeline keeps running for
+    its followers and still reads the file, so then it goes once that ends.
+    """
+    call = _in_flight.pending(pdf_digest)
+    if call is None:
+        uploads.remove_spooled(pdf_path)
+    else:
+        call.add_done_callback(lambda _: uploads.remove_spooled(pdf_path))
+
+async def _run_pipeline(filename, pdf_path, pdf_digest):
+    timings = {}
+    started = time.perf_counter()
+
+    # Identical PDFs reuse the cached Nanonets response
+    stage = time.perf_counter()
+    cache_key = ocr_cache.cache_key(pdf_digest, "flat-json")
+    # Cache reads and writes are file I/O; keep them off the event loop
+    result = await asyncio.to_thread(ocr_cache.get, cache_key)
+    if result is not None:
+        cache_status, backend = "hit", "cache"
+        metrics.OCR_CACHE.inc(result="hit")
+        logger.info("OCR cache hit: %s", cache_key)
+    else:
+        cache_status = "miss"
+        metrics.OCR_CACHE.inc(result="miss")
+        progress.publish("ocr_started")
+        # Another worker or CLI run may be sending the same PDF to Nanonets
+        # right now; wait for it and reuse the response it caches
+        async with single_flight.file_lock_async(cache_key) as waited:
+            result = await asyncio.to_thread(ocr_cache.get, cache_key) if waited else None
+            if result is not None:
+                cache_status, backend = "hit", "cache"
+                metrics.SINGLE_FLIGHT_JOINED.inc(scope="host")
+                metrics.SINGLE_FLIGHT_SAVED.inc(scope="host")
+                logger.info("Reused OCR result of a concurrent upload: %s", cache_key)
+            else:
+                result, backend = await _extract(filename, pdf_path, timings)
+                if backend == "nanonets":
+                    await asyncio.to_thread(ocr_cache.put, cache_key, result)
+    timings["ocr"] = time.perf_counter() - stage
+    metrics.EXTRACT_BACKEND.inc(backend=backend)
+    progress.publish("ocr_finished", backend=backend, cache=cache_status, seconds=timings["ocr"])
+
+    # Save JSON output; the request id keeps concurrent uploads of the same
+    # filename from sharing a JSON (and therefore a report) path
+    stage = time.perf_counter()
+    name_without_ext = os.path.splitext(filename)[0]
+    request_id = uuid.uuid4().hex[:8]
+    json_output_path = os.path.join(JSON_DIR, f"{name_without_ext}_{request_id}.json")
+
+    # The JSON and its report are kept out of retention sweeps until read back
+    with retention.protect(json_output_path):
+        # Created here, not at startup: not every ASGI host sends lifespan events
+        os.makedirs(JSON_DIR, exist_ok=True)
         with open(json_output_path, "w", encoding="utf-8") as f:
             json.dump(result, f, ensure_ascii=False, indent=4)
-        
-        print(f"[API] JSON saved: {json_output_path}")
-        
+
+        timings["save"] = time.perf_counter() - stage
+        metrics.JSON_SAVE.observe(timings["save"])
+        logger.debug("JSON saved: %s", json_output_path)
+
         # Try to run parser if it exists
+        stage = time.perf_counter()
         content = result.get("content", {})
         product_name = content.get("product_name") or content.get("product") or ""
         company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
-        
-        product_key = extract_keywords(product_name)
-        company_key = extract_keywords(company_name)
-        
-        print(f"[API] Dynamic keywords: Product='{product_key}', Company='{company_key}'")
-        
+
+        product_key = parser_registry.extract_keywords(product_name)
+        company_key = parser_registry.extract_keywords(company_name)
+
+        logger.info("Dynamic keywords: Product='%s', Company='%s'", product_key, company_key)
+
+        parser = parser_registry.get_parser(product_key, company_key)
+        parser_label = parser.__name__ if parser else "none"
+        timings["dispatch"] = time.perf_counter() - stage
+        metrics.PARSER_DISPATCH.observe(timings["dispatch"], parser=parser_label)
+        progress.publish("parser_chosen", parser=parser_label, product=product_key, company=company_key)
+
+        parser_result = None
         if product_key and company_key:
-            parser_file = f"{product_key}_{company_key}.py"
-            parser_path = os.path.join(CURRENT_DIR, parser_file)
-            
-            if os.path.exists(parser_path):
+            parser_name = f"{product_key}_{company_key}"
+
+            if parser:
+                stage = time.perf_counter()
                 try:
-                    print(f"[API] Running parser: {parser_file}")
-                    subprocess.run(
-                        ["python", parser_path, json_output_path],
-                        check=True,
-                        cwd=CURRENT_DIR,
-                        capture_output=True
-                    )
-                    print(f"[API] Parser executed successfully")
-                except subprocess.CalledProcessError as e:
-                    print(f"[API] Parser error: {e}")
+                    logger.debug("Running parser: %s", parser_name)
+                    parser_result = parser_registry.run_parser(product_key, company_key, json_output_path)
+                    logger.debug("Parser executed successfully")
+                except Exception as e:
+                    logger.exception("Parser error: %s", e)
+                timings["parse"] = time.perf_counter() - stage
+                metrics.PARSER_RUN.observe(timings["parse"], parser=parser_label)
+                # One event per evaluated parameter; skipped entirely when nobody listens
+                if parser_result and progress.listening():
+                    for row in parser_result.get("rows", []):
+                        progress.publish("parameter", **{k: row.get(k) for k in PARAMETER_EVENT_FIELDS})
+                    progress.publish("evaluated", non_compliant=parser_result.get("non_compliant"),
+                                     parameters=len(parser_result.get("rows", [])), seconds=timings["parse"])
             else:
-                print(f"[API] Parser not found: {parser_file}")
-        
-        # Check if HTML report was generated
+                logger.warning("Parser not found: %s", parser_name)
+
+        # Load the HTML report the parser wrote for this request
+        stage = time.perf_counter()
         html_report_content = None
-        html_files = [f for f in os.listdir(JSON_DIR) if f.endswith('_report.html')]
-        if html_files:
-            # Get the most recently created HTML file
-            html_files.sort(key=lambda f: os.path.getmtime(os.path.join(JSON_DIR, f)), reverse=True)
-            html_file_path = os.path.join(JSON_DIR, html_files[0])
+        if parser_result and parser_result.get("report_path"):
             try:
-                with open(html_file_path, 'r', encoding='utf-8') as f:
+                with open(parser_result["report_path"], 'r', encoding='utf-8') as f:
                     html_report_content = f.read()
-                print(f"[API] HTML report loaded: {html_files[0]}")
+                logger.debug("HTML report loaded: %s", os.path.basename(parser_result['report_path']))
             except Exception as e:
-                print(f"[API] Error reading HTML: {e}")
+                logger.error("Error reading HTML: %s", e)
+            timings["report"] = time.perf_counter() - stage
+            metrics.REPORT_LOAD.observe(timings["report"], parser=parser_label)
+            if html_report_content is not None:
+                progress.publish("report_ready", bytes=len(html_report_content), seconds=timings["report"])
+
+    # Keep the outcome queryable after retention removes the output files
+    stage = time.perf_counter()
+    result_id = None
+    try:
+        evaluation = {k: v for k, v in parser_result.items() if k != "report_path"} if parser_result else None
+        result_id = await asyncio.to_thread(
+            results_store.record, filename, pdf_digest, content, parser_label if parser else None,
+            evaluation, dict(timings), backend,
+        )
+    except Exception as e:
+        logger.exception("Results store error: %s", e)
+    timings["store"] = time.perf_counter() - stage
+    timings["total"] = time.perf_counter() - started
+
+    return {
+        "success": True,
+        "filename": filename,
+        "data": result,
+        "htmlReport": html_report_content,
+        "parserResult": parser_result,
+        "ocrCache": cache_status,
+        "ocrBackend": backend,
+        "resultId": result_id,
+        "coalesced": False
+    }, timings, parser_label
+
+# Client-chosen correlation ids (X-Request-ID) name the GET /progress/ stream
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Row fields sent with each "parameter" progress event
+PARAMETER_EVENT_FIELDS = ("parameter", "result", "spec", "status", "within_spec", "compliance_key")
+
+def _client_request_id(value):
+    return value if value and _REQUEST_ID.match(value) else None
+
+@app.post("/upload-pdf/")
+async def upload_pdf(file: UploadFile = File(...), x_request_id: str = Header(None)):
+    """
+    Process PDF using Nanonets API and optionally run parser.
+    Send X-Request-ID and follow GET /progress/{that id} for stage events.
+    """
+    pdf_path = None
+    started = time.perf_counter()
+    parser_label, outcome = "none", "error"
+    try:
+        applog.new_request_id(_client_request_id(x_request_id))
+        logger.info("POST /upload-pdf/ received %s", file.filename, extra={"content_type": file.content_type})
+        
+        # Spool to disk in chunks so memory stays flat regardless of PDF size
+        with metrics.UPLOAD_READ.time():
+            pdf_path, pdf_size, pdf_digest = await uploads.spool_upload(file)
+        logger.debug("File size: %d bytes", pdf_size)
+        progress.publish("received", filename=file.filename, bytes=pdf_size)
+        
+        response, _, parser_label = await run_pipeline(file.filename, pdf_path, pdf_digest)
+        outcome = "success"
         
         # Return success with JSON data and HTML report
-        print(f"[API] Returning success response")
-        return {
-            "success": True,
-            "filename": file.filename,
-            "data": result,
-            "htmlReport": html_report_content
-        }
+        logger.info("Upload processed", extra={"parser": parser_label, "seconds": round(time.perf_counter() - started, 3)})
+        return response
         
-    except requests.exceptions.RequestException as e:
-        print(f"[API] Nanonets API error: {str(e)}")
+    except uploads.UploadTooLarge as e:
+        outcome = "too_large"
+        logger.warning("Rejected upload: %s", e)
+        progress.publish("failed", error=f"File too large: {str(e)}")
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"File too large: {str(e)}"}
+        )
+    except ocr_resilience.CircuitOpenError as e:
+        # Nanonets is down: keep the spooled file and run it as a job once it recovers
+        job_id = _defer_as_job(file.filename, pdf_path, pdf_digest, e.retry_after)
+        if job_id is None:
+            outcome = "unavailable"
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": e.retry_after_header},
+                content={"success": False, "error": f"Nanonets API unavailable: {str(e)}", "retryAfter": e.retry_after}
+            )
+        outcome = "queued"
+        pdf_path = None
+        return JSONResponse(
+            status_code=202,
+            content={"success": False, "error": f"Nanonets API unavailable: {str(e)}", "jobId": job_id, "status": jobs.QUEUED}
+        )
+    except ocr_client.HTTPError as e:
+        outcome = "ocr_error"
+        logger.error("Nanonets API error: %s", e)
         return {
             "success": False,
             "error": f"Nanonets API error: {str(e)}"
         }
     except Exception as e:
-        print(f"[API] Processing error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Processing error: %s", e)
         return {
             "success": False,
             "error": f"Processing error: {str(e)}"
         }
+    finally:
+        if pdf_path:
+            _release_spool(pdf_path, pdf_digest)
+        metrics.REQUEST_TOTAL.observe(time.perf_counter() - started, endpoint="upload-pdf", parser=parser_label, outcome=outcome)
+
+# === BATCH ===
+# One request carries a shipment's COAs (a ZIP and/or several PDFs); they run
+# through the same pipeline BATCH_CONCURRENCY at a time and each result is
+# streamed back as an NDJSON line as soon as it is ready.
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
 
-def extract_keywords(name):
+async def _spool_batch(files):
     """
-    Extract a meaningful keyword from a product name.
-    Ignores common words like 'Non', 'GMO', 'Soya', 'Whey', 'Powder', etc.
+    Spool every uploaded PDF and every PDF inside uploaded ZIPs; returns
+    document dicts. The spooled PDFs together stay within MAX_BATCH_BYTES
+    and MAX_BATCH_FILES, however the request body was sent.
     """
-    if not name:
-        return None
-    ignore_words = {"non", "gmo", "soya", "powder", "permeate", "milk", "optilec", "optileec"}
-    words = [w for w in name.split() if w.lower() not in ignore_words]
-    if not words:
+    documents, total, pdfs = [], 0, 0
+    try:
+        for file in files:
+            remaining = uploads.MAX_BATCH_BYTES - total
+            if uploads.is_zip(file.filename, file.content_type):
+                # The ZIP is removed once unpacked; its PDFs count towards the batch
+                zip_path, _, _ = await uploads.spool_upload(file, remaining, suffix=".zip")
+                try:
+                    entries = await asyncio.to_thread(uploads.spool_zip, zip_path, max_total=remaining,
+                                                      max_files=uploads.MAX_BATCH_FILES - pdfs)
+                except zipfile.BadZipFile as e:
+                    entries = [{"filename": file.filename, "error": f"Not a valid ZIP: {e}"}]
+                finally:
+                    uploads.remove_spooled(zip_path)
+                documents.extend(entries)
+                spooled = [entry for entry in entries if entry.get("pdf_path")]
+                total += sum(entry["size"] for entry in spooled)
+                pdfs += len(spooled)
+            elif pdfs >= uploads.MAX_BATCH_FILES:
+                documents.append({"filename": file.filename, "error": f"Batch is limited to {uploads.MAX_BATCH_FILES} PDFs"})
+            else:
+                try:
+                    pdf_path, size, pdf_digest = await uploads.spool_upload(file, min(uploads.MAX_UPLOAD_BYTES, remaining))
+                except uploads.UploadTooLarge as e:
+                    documents.append({"filename": file.filename, "error": f"File too large: {str(e)}"})
+                    continue
+                total, pdfs = total + size, pdfs + 1
+                documents.append({"filename": file.filename, "pdf_path": pdf_path, "size": size, "pdf_digest": pdf_digest})
+    except BaseException:
+        for document in documents:
+            if document.get("pdf_path"):
+                uploads.remove_spooled(document["pdf_path"])
+        raise
+    return documents
+
+async def _run_batch_document(index, document, semaphore, batch):
+    """Process one spooled document of a batch; returns its NDJSON result."""
+    filename, pdf_path = document["filename"], document.get("pdf_path")
+    if pdf_path is None:
+        return {"index": index, "success": False, "filename": filename, "error": document["error"]}
+
+    started = time.perf_counter()
+    parser_label, outcome = "none", "error"
+    try:
+        async with semaphore:
+            if batch["abandoned"]:
+                outcome = "abandoned"
+                return None
+            applog.set_request_id(f"{batch['id']}-{index}")
+            progress.publish("received", filename=filename, bytes=document["size"])
+            response, _, parser_label = await run_pipeline(filename, pdf_path, document["pdf_digest"])
+        outcome = "success"
+        return {"index": index, **response}
+    except ocr_resilience.CircuitOpenError as e:
+        job_id = _defer_as_job(filename, pdf_path, document["pdf_digest"], e.retry_after)
+        if job_id is None:
+            outcome = "unavailable"
+            return {"index": index, "success": False, "filename": filename,
+                    "error": f"Nanonets API unavailable: {str(e)}", "retryAfter": e.retry_after}
+        outcome = "queued"
+        pdf_path = None
+        return {"index": index, "success": False, "filename": filename, "error": f"Nanonets API unavailable: {str(e)}",
+                "jobId": job_id, "status": jobs.QUEUED}
+    except ocr_client.HTTPError as e:
+        outcome = "ocr_error"
+        logger.error("Nanonets API error for %s: %s", filename, e)
+        return {"index": index, "success": False, "filename": filename, "error": f"Nanonets API error: {str(e)}"}
+    except Exception as e:
+        logger.exception("Processing error for %s: %s", filename, e)
+        return {"index": index, "success": False, "filename": filename, "error": f"Processing error: {str(e)}"}
+    finally:
+        if pdf_path:
+            _release_spool(pdf_path, document["pdf_digest"])
+        metrics.REQUEST_TOTAL.observe(time.perf_counter() - started, endpoint="upload-batch", parser=parser_label, outcome=outcome)
+
+async def _stream_batch(documents, batch):
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    tasks = [asyncio.create_task(_run_batch_document(i, d, semaphore, batch)) for i, d in enumerate(documents)]
+    succeeded = 0
+    try:
+        for task in asyncio.as_completed(tasks):
+            line = await task
+            succeeded += bool(line.get("success"))
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        seconds = time.perf_counter() - started
+        logger.info("Batch %s done: %d/%d succeeded in %.2fs", batch["id"], succeeded, len(documents), seconds)
+        yield json.dumps({"summary": {"batchId": batch["id"], "total": len(documents), "succeeded": succeeded,
+                                      "failed": len(documents) - succeeded, "seconds": seconds}}) + "\n"
+    finally:
+        # Client went away: documents already running finish (and are
+        # stored); the ones still waiting are dropped with their files
+        batch["abandoned"] = True
+
+@app.post("/upload-batch/")
+async def upload_batch(files: List[UploadFile] = File(...), x_request_id: str = Header(None)):
+    """
+    Process a bundle of COAs: a ZIP of PDFs and/or several PDFs in the
+    "files" field. Streams one NDJSON line per document ({"index", ...the
+    /upload-pdf/ response}) in completion order, then a {"summary"} line.
+    Stage events of document n are on GET /progress/{X-Request-ID}-{n}.
+    """
+    applog.new_request_id(_client_request_id(x_request_id))
+    batch = {"id": applog.get_request_id(), "abandoned": False}
+    logger.info("POST /upload-batch/ received %d files", len(files))
+    try:
+        documents = await _spool_batch(files)
+    except uploads.UploadTooLarge as e:
+        logger.warning("Rejected batch: %s", e)
+        return JSONResponse(status_code=413, content={"success": False, "error": f"Batch too large: {str(e)}"})
+    if not documents:
+        return JSONResponse(status_code=400, content={"success": False, "error": "No PDFs in the upload"})
+    logger.info("Batch %s: %d documents", batch["id"], len(documents))
+    return StreamingResponse(_stream_batch(documents, batch), media_type="application/x-ndjson")
+
+# === JOBS ===
+# Submit returns a job id at once; a pool of background workers runs the same
+# pipeline and stores the outcome in the jobs database for GET /jobs/{id}.
+_job_queue = None
+_job_workers = []
+
+def jobs_running():
+    """True when this process runs job workers (started by the lifespan)."""
+    return _job_queue is not None
+
+def _defer_as_job(filename, pdf_path, pdf_digest, retry_after):
+    """
+    Keep a spooled upload as a job that runs once Nanonets recovers; returns
+    the job id, or None (the upload is dropped) without job workers.
+    """
+    if not jobs_running():
+        logger.warning("Nanonets unavailable and no job workers, %s not queued", filename)
+        progress.publish("failed", error="Nanonets API unavailable", retryAfter=retry_after)
         return None
-    return words[0].strip()
+    job_id = jobs.create(filename, pdf_path, pdf_digest)
+    _queue_job_later({"id": job_id, "filename": filename, "pdf_path": pdf_path, "pdf_digest": pdf_digest}, retry_after)
+    logger.warning("Nanonets unavailable, %s queued as job %s", filename, job_id)
+    # Listeners carry on with GET /progress/{job_id}
+    progress.publish("queued", jobId=job_id, retryAfter=retry_after)
+    return job_id
+
+def _queue_job_later(job, delay):
+    """Queue a job again after delay seconds (used while the circuit is open)."""
+    asyncio.get_running_loop().call_later(max(1.0, delay), _job_queue.put_nowait, job)
+
+async def _run_job(job):
+    job_id, pdf_path = job["id"], job["pdf_path"]
+    if not pdf_path or not os.path.exists(pdf_path):
+        jobs.fail(job_id, "Uploaded file is no longer available")
+        progress.publish("failed", channel=job_id[:12], error="Uploaded file is no longer available")
+        return
+
+    applog.set_request_id(job_id[:12])
+    jobs.mark_running(job_id)
+    logger.info("Running job %s: %s", job_id, job['filename'])
+    progress.publish("running", jobId=job_id, filename=job["filename"])
+    started = time.perf_counter()
+    parser_label, outcome = "none", "error"
+    try:
+        response, timings, parser_label = await run_pipeline(job["filename"], pdf_path, job["pdf_digest"])
+        jobs.finish(job_id, response, timings)
+        outcome = "success"
+        logger.info("Job %s done in %.2fs", job_id, timings['total'], extra={"parser": parser_label, "timings": timings})
+    except ocr_resilience.CircuitOpenError as e:
+        # Back to the queue with its file until Nanonets takes requests again
+        outcome = "deferred"
+        jobs.requeue(job_id)
+        _queue_job_later(job, e.retry_after)
+        progress.publish("deferred", retryAfter=e.retry_after)
+        logger.warning("Job %s deferred %.0fs: %s", job_id, e.retry_after, e)
+        pdf_path = None
+    except ocr_client.HTTPError as e:
+        outcome = "ocr_error"
+        logger.error("Job %s Nanonets API error: %s", job_id, e)
+        jobs.fail(job_id, f"Nanonets API error: {str(e)}")
+    except Exception as e:
+        logger.exception("Job %s processing error: %s", job_id, e)
+        jobs.fail(job_id, f"Processing error: {str(e)}")
+    finally:
+        if pdf_path:
+            _release_spool(pdf_path, job["pdf_digest"])
+        metrics.REQUEST_TOTAL.observe(time.perf_counter() - started, endpoint="jobs", parser=parser_label, outcome=outcome)
+
+async def _job_worker():
+    while True:
+        job = await _job_queue.get()
+        try:
+            await _run_job(job)
+        finally:
+            _job_queue.task_done()
+
+def start_job_workers():
+    global _job_queue
+    jobs.init()
+    _job_queue = asyncio.Queue()
+    # Jobs accepted before a restart are picked up again
+    pending = jobs.unfinished()
+    for job in pending:
+        _job_queue.put_nowait(job)
+    for _ in range(jobs.JOB_WORKERS):
+        _job_workers.append(asyncio.create_task(_job_worker()))
+    logger.info("%d job workers started, %d pending jobs resumed", jobs.JOB_WORKERS, len(pending))
+
+async def stop_job_workers():
+    global _job_queue
+    for task in _job_workers:
+        task.cancel()
+    await asyncio.gather(*_job_workers, return_exceptions=True)
+    _job_workers.clear()
+    _job_queue = None
+
+# === RETENTION ===
+# Old JSON files and reports are swept in the background; the first sweep runs
+# at startup so a restarted worker reports disk usage right away
+_retention_task = None
+
+async def _retention_loop():
+    while True:
+        try:
+            await asyncio.to_thread(retention.sweep_all)
+        except Exception as e:
+            logger.exception("Retention sweep failed: %s", e)
+        await asyncio.sleep(retention.INTERVAL)
+
+def start_retention():
+    global _retention_task
+    _retention_task = asyncio.create_task(_retention_loop())
+
+async def stop_retention():
+    global _retention_task
+    if _retention_task is not None:
+        _retention_task.cancel()
+        await asyncio.gather(_retention_task, return_exceptions=True)
+        _retention_task = None
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """
+    Queue a PDF for background processing and return its job id at once.
+    """
+    if not jobs_running():
+        return JSONResponse(status_code=503, content={"success": False, "error": "Background jobs are not available on this instance"})
+    try:
+        applog.new_request_id()
+        logger.info("POST /jobs/ received %s", file.filename)
+        # The spooled file is kept until a worker has processed it
+        pdf_path, pdf_size, pdf_digest = await uploads.spool_upload(file)
+        job_id = jobs.create(file.filename, pdf_path, pdf_digest)
+        await _job_queue.put({"id": job_id, "filename": file.filename, "pdf_path": pdf_path, "pdf_digest": pdf_digest})
+        logger.info("Job %s queued (%d bytes)", job_id, pdf_size, extra={"job_id": job_id})
+        return {"success": True, "jobId": job_id, "status": jobs.QUEUED}
+    except uploads.UploadTooLarge as e:
+        logger.warning("Rejected upload: %s", e)
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"File too large: {str(e)}"}
+        )
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Job status and timings; the finished upload response once it is done.
+    """
+    if not jobs_running():
+        return JSONResponse(status_code=503, content={"success": False, "error": "Background jobs are not available on this instance"})
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Job not found"})
+
+    timings = dict(job["timings"])
+    if job["started_at"]:
+        timings["queued"] = job["started_at"] - job["created_at"]
+    return {
+        "success": job["status"] != jobs.FAILED,
+        "jobId": job["id"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "createdAt": job["created_at"],
+        "startedAt": job["started_at"],
+        "finishedAt": job["finished_at"],
+        "timings": timings,
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+# === PROGRESS ===
+# Server-Sent Events of one upload's pipeline stages. Subscribe before
+# uploading: POST /upload-pdf/ with an X-Request-ID header and open
+# /progress/{that id} first. Jobs are followed by job id. Events are kept in
+# this worker process only, so the stream and the upload must reach the same
+# instance. vercel.json does not route it to the serverless function, nor
+# /jobs (background workers) and /upload-batch (a whole shipment in one
+# invocation); those need a long-running server.
+async def _progress_events(request, channel, job):
+    with progress.subscribe(channel) as queue:
+        if job is None:
+            yield progress.format_sse({"stage": "subscribed", "ts": time.time(), "id": channel})
+        else:
+            snapshot = {"stage": "job", "ts": time.time(), "jobId": job["id"], "status": job["status"]}
+            yield progress.format_sse(snapshot)
+            if job["status"] in (jobs.DONE, jobs.FAILED):
+                return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), progress.KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # SSE comment line; keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield progress.format_sse(event)
+            if event["stage"] in progress.FINAL_STAGES:
+                return
+
+@app.get("/progress/{progress_id}")
+async def stream_progress(progress_id: str, request: Request):
+    """
+    Stage events (received, ocr_started, ocr_finished, parser_chosen,
+    parameter, evaluated, report_ready, then done, failed or queued) of
+    the upload sent with X-Request-ID: progress_id, or of a job.
+    """
+    if not _REQUEST_ID.match(progress_id):
+        return JSONResponse(status_code=400, content={"success": False, "error": "Invalid progress id"})
+    job = jobs.get(progress_id) if jobs_running() else None
+    channel = progress_id[:12] if job is not None else progress_id
+    return StreamingResponse(
+        _progress_events(request, channel, job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# === RESULTS ===
+# The store is a SQLite file in the temp dir, which each serverless instance
+# has its own copy of; vercel.json therefore does not route /results, which
+# needs a long-running server (with RESULTS_DB on durable storage).
+@app.get("/results/")
+def query_results(supplier: str = None, product: str = None, batch: str = None, parameter: str = None,
+                  failing: bool = None, status: str = None, since: str = None, until: str = None,
+                  limit: int = results_store.QUERY_LIMIT, offset: int = 0):
+    """
+    Stored COAs matching the filters, e.g. Mahaan whey batches failing
+    enterobacteriaceae: ?supplier=Mahaan&product=Whey&parameter=enterobacteriaceae&failing=true&since=2024-07-01
+    """
+    for name, value in (("since", since), ("until", until)):
+        if value and results_store.parse_date(value) != value:
+            return JSONResponse(status_code=400, content={"success": False, "error": f"{name} must be an ISO date (YYYY-MM-DD)"})
+    results = results_store.query(supplier=supplier, product=product, batch=batch, parameter=parameter, failing=failing,
+                                  status=status, since=since, until=until, limit=limit, offset=offset)
+    return {"success": True, "count": len(results), "results": results}
+
+@app.get("/results/{result_id}")
+def get_result(result_id: str):
+    """One stored COA with its OCR content and every parameter row."""
+    coa = results_store.get(result_id)
+    if coa is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Result not found"})
+    return {"success": True, "result": coa}
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/health")
 def health_check():
-    print("[API] GET /health called")
+    logger.debug("GET /health called")
     return {"status": "healthy", "service": "PDF OCR API"}
\ No newline at end of file
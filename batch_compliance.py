@@ -0,0 +1,250 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+import parser_registry
+
+# === REASON CODES ===
+# Outcome of one numeric comparison, shared by both parser families
+WITHIN, EXCEEDS_SPEC, EXCEEDS_UPPER, BELOW_LOWER, NON_NUMERIC = range(5)
+
+REASONS = {
+    "whey": ["Within Spec", "Exceeds Spec", "Exceeds upper bound", "Below lower bound", "Non-numeric or missing spec"],
+    "lecithin": ["Within Spec", "Exceeds Spec", "Exceeds upper bound", "Below lower bound", "Non-numeric result or missing spec"],
+}
+
+def parser_family(parser):
+    """
+    Whey parsers round to 2 places and skip zero/None limits (check_compliance);
+    Lecithin parsers compare exactly and only skip None limits (interval_within).
+    """
+    return "lecithin" if hasattr(parser, "interval_within") else "whey"
+
+def _round2(values):
+    """
+    np.round to 2 places, falling back to Python's round() near .xx5 ties
+    where the two can disagree, so comparisons match the scalar parsers.
+    """
+    rounded = np.round(values, 2)
+    scaled = np.abs(values * 100)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+def _bound(interval, name):
+    value = interval.get(name)
+    return np.nan if value is None else value
+
+def _compare(family, r_min, r_max, s_min, s_max, numeric):
+    """Reason code for every (result, spec alternative) pair at once."""
+    codes = np.full(len(r_min), NON_NUMERIC, dtype=np.int8)
+    has_max = ~np.isnan(s_max)
+    has_min = ~np.isnan(s_min)
+
+    if family == "whey":
+        # `if s_max` / `if s_min` in check_compliance also skip a zero limit
+        check_max = has_max & (s_max != 0)
+        check_min = has_min & (s_min != 0)
+        exceeds = check_max & (_round2(r_max) > _round2(s_max))
+        below = check_min & (_round2(r_min) < _round2(s_min))
+    else:
+        exceeds = has_max & (r_max > s_max)
+        below = has_min & (r_min < s_min)
+
+    zero_limit = has_max & (s_max == 0)
+    codes[numeric] = WITHIN
+    codes[numeric & below] = BELOW_LOWER
+    codes[numeric & exceeds] = EXCEEDS_UPPER
+    codes[numeric & zero_limit] = np.where(r_max[numeric & zero_limit] == 0, WITHIN, EXCEEDS_SPEC)
+    return codes
+
+def _is_missing(family, raw_result, spec):
+    if family == "whey":
+        return not raw_result or not spec or not spec["raw"]
+    return raw_result is None or spec is None
+
+def _needs_scalar(family, parser, key, result_int):
+    """Rows the arrays cannot express: textual/range keys and open-ended results."""
+    if family == "whey":
+        if key.lower() in parser.textual_keys or key.lower() in getattr(parser, "range_keys", []):
+            return True
+    return result_int is not None and (result_int.get("min") is None or result_int.get("max") is None)
+
+def _scalar_check(family, parser, result_int, spec, raw_result, key):
+    if family == "whey":
+        return parser.check_or_specs(result_int, spec, raw_result, key)
+    return parser.check_or_specs(result_int, spec)
+
+def evaluate_batch(documents):
+    """
+    Check many COAs at once. documents is a list of (name, parser, content).
+    Lookups run per document as in the parsers; every numeric spec comparison
+    of the whole batch is then done in one pass over NumPy arrays.
+    Returns one {"file", "parser", "product_name", "company_name", "rows",
+    "non_compliant"} dict per document, rows carrying the same status and
+    reason the parser's own evaluate() would give.
+    """
+    rows = []        # (doc index, family, key, compliance key, alt start, alt count, spec)
+    results = []     # per row: (status, reason, within_spec), None until the arrays decide it
+    alternatives = []  # per spec alternative: (r_min, r_max, s_min, s_max, numeric)
+    outputs = []
+
+    for doc_i, (name, parser, content) in enumerate(documents):
+        family = parser_family(parser)
+        resolved = parser.resolve(content)
+        outputs.append({
+            "file": name,
+            "parser": parser.__name__,
+            "product_name": resolved["product_name"],
+            "company_name": resolved["company_name"],
+            "rows": [],
+            "non_compliant": False,
+        })
+
+        for key, raw_result, spec in resolved["params"]:
+            compliance_key = key in parser.compliance_keys
+            result_int = parser.parse_interval(raw_result, is_spec=False)
+
+            if _is_missing(family, raw_result, spec):
+                results.append(("Missing", "Missing result or spec", False))
+            elif _needs_scalar(family, parser, key, result_int):
+                is_ok, reason = _scalar_check(family, parser, result_int, spec, raw_result, key)
+                results.append(("Within Spec" if is_ok else "Exceeds Spec", reason, is_ok))
+            else:
+                results.append(None)
+                start = len(alternatives)
+                for alt in spec["alternatives"]:
+                    spec_int = alt["interval"]
+                    if result_int and spec_int:
+                        alternatives.append((result_int["min"], result_int["max"], _bound(spec_int, "min"), _bound(spec_int, "max"), True))
+                    else:
+                        alternatives.append((0, 0, np.nan, np.nan, False))
+                rows.append((doc_i, family, key, compliance_key, start, len(spec["alternatives"]), spec))
+                continue
+            rows.append((doc_i, family, key, compliance_key, -1, 0, spec))
+
+    if alternatives:
+        table = np.array([a[:4] for a in alternatives], dtype=np.float64)
+        numeric = np.array([a[4] for a in alternatives], dtype=bool)
+        families = np.empty(len(alternatives), dtype=object)
+        for _, family, _, _, start, count, _ in rows:
+            if count:
+                families[start:start + count] = family
+
+        codes = np.full(len(alternatives), NON_NUMERIC, dtype=np.int8)
+        for family in ("whey", "lecithin"):
+            mask = families == family
+            if mask.any():
+                codes[mask] = _compare(family, table[mask, 0], table[mask, 1], table[mask, 2], table[mask, 3], numeric[mask])
+
+        # First matching alternative of every row (len(codes) when none matches)
+        positions = np.where(codes == WITHIN, np.arange(len(codes)), len(codes))
+        row_starts = np.array([r[4] for r in rows if r[5]], dtype=np.intp)
+        first_match = np.minimum.reduceat(positions, row_starts)
+    else:
+        codes, first_match = np.array([], dtype=np.int8), np.array([], dtype=np.intp)
+
+    vector_i = 0
+    for (doc_i, family, key, compliance_key, start, count, spec), decided in zip(rows, results):
+        if decided is None:
+            match = first_match[vector_i]
+            vector_i += 1
+            if not spec["or"]:
+                is_ok = codes[start] == WITHIN
+                decided = ("Within Spec" if is_ok else "Exceeds Spec", REASONS[family][codes[start]], bool(is_ok))
+            elif match < start + count:
+                decided = ("Within Spec", f"Within Spec (matched: {spec['alternatives'][match - start]['text']})", True)
+            else:
+                decided = ("Exceeds Spec", "Does not match any OR condition", False)
+
+        status, reason, is_ok = decided
+        output = outputs[doc_i]
+        output["rows"].append({
+            "parameter": key,
+            "status": status,
+            "reason": reason,
+            "within_spec": is_ok,
+            "compliance_key": compliance_key,
+        })
+        if compliance_key and not is_ok:
+            output["non_compliant"] = True
+
+    return outputs
+
+def load_documents(paths, parser_name=None):
+    """
+    Read saved Nanonets JSON files (or directories of them) and pair each with
+    its parser: the named one, or the one the API would pick for its content.
+    Files without a matching parser are reported and skipped.
+    """
+    parsers = parser_registry.load_parsers()
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path])
+
+    documents = []
+    for json_file in files:
+        with open(json_file, "r", encoding="utf-8") as f:
+            content = json.load(f).get("content", {})
+        parser = parsers.get(parser_name) if parser_name else parser_registry.detect_parser(content)
+        if parser is None:
+            print(f"[BATCH] No parser for {json_file}, skipped")
+            continue
+        documents.append((json_file, parser, content))
+    return documents
+
+def verify(documents, outputs):
+    """Compare against each parser's scalar evaluate(); returns the mismatches."""
+    mismatches = []
+    for (name, parser, content), output in zip(documents, outputs):
+        expected = parser.evaluate(content)
+        for want, got in zip(expected["rows"], output["rows"]):
+            if (want["status"], want["reason"], want["within_spec"]) != (got["status"], got["reason"], got["within_spec"]):
+                mismatches.append((name, want["parameter"], want["status"], want["reason"], got["status"], got["reason"]))
+        if expected["non_compliant"] != output["non_compliant"]:
+            mismatches.append((name, "non_compliant", expected["non_compliant"], "", output["non_compliant"], ""))
+    return mismatches
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check many saved Nanonets JSON files against their specs in one batch.")
+    parser.add_argument("paths", nargs="+", help="JSON files or directories of JSON files")
+    parser.add_argument("--parser", default=None, help="parser module to use for every file (default: detect per file)")
+    parser.add_argument("--output", default=None, help="write the batch results to this JSON file")
+    parser.add_argument("--verify", action="store_true", help="also run the scalar parsers and report any difference")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    documents = load_documents(args.paths, args.parser)
+    if not documents:
+        print("[BATCH] No documents to evaluate")
+        return 1
+
+    start = time.perf_counter()
+    outputs = evaluate_batch(documents)
+    elapsed = time.perf_counter() - start
+
+    row_count = sum(len(o["rows"]) for o in outputs)
+    failing = sum(1 for o in outputs if o["non_compliant"])
+    print(f"[BATCH] {len(outputs)} documents, {row_count} parameters in {elapsed:.3f}s, {failing} non-compliant")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(outputs, f, indent=2)
+        print(f"[BATCH] Results written to {args.output}")
+
+    if args.verify:
+        mismatches = verify(documents, outputs)
+        for mismatch in mismatches:
+            print("[BATCH] Mismatch:", mismatch)
+        print(f"[BATCH] Verified against scalar parsers: {len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
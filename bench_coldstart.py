@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PDF = os.path.join(BASE_DIR, "docs", "3439 COA - 2030CE080412 - amol Kate.pdf")
+
+# Serverless entry points: the root app (vercel.json build) and the api/ function
+ENTRY_POINTS = {
+    "backend_api": os.path.join(BASE_DIR, "backend_api.py"),
+    "api/backend_api": os.path.join(BASE_DIR, "api", "backend_api.py"),
+}
+
+# Runs in a fresh interpreter per trial: import the entry point, run the ASGI
+# lifespan startup, answer GET /health, then optionally one upload. The app is
+# driven directly so no HTTP client import skews the numbers.
+PROBE = r"""
+import asyncio, importlib.util, json, os, sys, time
+started = time.perf_counter()
+path, pdf = sys.argv[1], sys.argv[2]
+sys.path.insert(0, os.path.dirname(os.path.dirname(path)) if "/api/" in path else os.path.dirname(path))
+spec = importlib.util.spec_from_file_location("entry", path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+
+async def call(app, scope, body=b""):
+    sent, status = [{"type": "http.request", "body": body, "more_body": False}], []
+    async def receive():
+        return sent.pop() if sent else {"type": "http.disconnect"}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    await app(scope, receive, send)
+    return status[0]
+
+async def lifespan(app):
+    queue = asyncio.Queue()
+    await queue.put({"type": "lifespan.startup"})
+    done = asyncio.Event()
+    async def receive():
+        return await queue.get()
+    async def send(message):
+        if message["type"].startswith("lifespan.startup"):
+            done.set()
+    asyncio.ensure_future(app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send))
+    await done.wait()
+
+def http_scope(method, path, headers=()):
+    return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": list(headers),
+            "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+
+async def main():
+    out = {"import": imported - started}
+    await lifespan(module.app)
+    out["health_status"] = await call(module.app, http_scope("GET", "/health"))
+    out["first_response"] = time.perf_counter() - started
+    if pdf:
+        boundary = "benchboundary"
+        with open(pdf, "rb") as f:
+            body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(pdf)}\"\r\n"
+                    f"Content-Type: application/pdf\r\n\r\n").encode() + f.read() + f"\r\n--{boundary}--\r\n".encode()
+        headers = [(b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+                   (b"content-length", str(len(body)).encode())]
+        stage = time.perf_counter()
+        out["upload_status"] = await call(module.app, http_scope("POST", "/upload-pdf/", headers), body)
+        out["first_upload"] = time.perf_counter() - stage
+    print("BENCH_RESULT " + json.dumps(out))
+
+asyncio.run(main())
+"""
+
+def run_trial(path, pdf, env):
+    """One cold process; returns the probe's timings plus the total wall time, or an error string."""
+    # Fresh databases and OCR cache each time, as on a new serverless instance
+    scratch = tempfile.mkdtemp(prefix="bench_coldstart_")
+    env = dict(env, JOBS_DB=os.path.join(scratch, "jobs.sqlite3"), RESULTS_DB=os.path.join(scratch, "results.sqlite3"),
+               OCR_CACHE_DIR=os.path.join(scratch, "ocr_cache"))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", PROBE, path, pdf or ""], env=env, cwd=tempfile.gettempdir(),
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            row = json.loads(line[len("BENCH_RESULT "):])
+            row["process"] = wall
+            shutil.rmtree(scratch, ignore_errors=True)
+            return row
+    shutil.rmtree(scratch, ignore_errors=True)
+    lines = (proc.stderr or proc.stdout).strip().splitlines()
+    return lines[-1] if lines else f"exit status {proc.returncode}"
+
+def bench_entry(name, path, trials, pdf, env):
+    rows, error = [], None
+    for _ in range(trials):
+        row = run_trial(path, pdf, env)
+        if isinstance(row, str):
+            error = row
+            break
+        rows.append(row)
+    if error:
+        return {"entry": name, "error": error}
+    summary = {"entry": name, "trials": len(rows)}
+    for key in ("import", "first_response", "process", "first_upload"):
+        values = [row[key] for row in rows if key in row]
+        if values:
+            summary[key] = statistics.median(values)
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Median import time and cold-start time (process start to the first /health "
+                    "response) of the serverless entry points, one fresh interpreter per trial.")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--entries", nargs="*", default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    parser.add_argument("--url", default=None,
+                        help="also time the first upload against this Nanonets /extract URL (e.g. nanonets_stub.py)")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="PDF for the first upload (with --url)")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    if args.url:
+        env["NANONETS_URL"] = args.url
+    print(f"[BENCH] {args.trials} cold starts per entry point")
+    rows = []
+    for name in args.entries:
+        row = bench_entry(name, ENTRY_POINTS[name], args.trials, args.pdf if args.url else None, env)
+        rows.append(row)
+        if "error" in row:
+            print(f"[BENCH] {name:<16} failed: {row['error']}")
+            continue
+        line = (f"[BENCH] {name:<16} import {row['import'] * 1000:6.0f} ms  first response "
+                f"{row['first_response'] * 1000:6.0f} ms  process {row['process'] * 1000:6.0f} ms")
+        if "first_upload" in row:
+            line += f"  first upload {row['first_upload'] * 1000:6.0f} ms"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+import argparse
+import contextlib
+import copy
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import parser_registry
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BASE_DIR, "check")
+BASELINE_FILE = os.path.join(BASE_DIR, "bench_parsers_baseline.json")
+
+# A parser counts as regressed when its docs/s drops by more than this fraction
+TOLERANCE = 0.10
+
+STAGES = ["load", "resolve", "evaluate", "report"]
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence parser output (log records and any remaining prints) so it
+    neither floods the output nor skews timings.
+    """
+    previous = logging.root.manager.disable
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(previous)
+
+# === CORPUS ===
+def retarget(content, parser_name):
+    """
+    Point a document at one parser: product/company become the parser's own
+    name parts, so the parser evaluates its full mandatory key list.
+    """
+    product, company = parser_name.split("_", 1)
+    doc = dict(content)
+    doc["product_name"] = product
+    doc["company_name"] = company
+    return doc
+
+def synthetic_document(parser, parser_name, rng):
+    """A document carrying a plausible result for every mandatory parameter."""
+    product, company = parser_name.split("_", 1)
+    doc = {"product_name": product, "company_name": company}
+    specs = parser.load_specs()
+    for key in parser.resolve(doc)["keys"]:
+        spec = parser.get_spec(specs, key)
+        interval = spec["alternatives"][0]["interval"] if spec else None
+        if interval and interval.get("max") is not None:
+            low = interval.get("min") or 0
+            doc[f"{key}_result"] = f"{rng.uniform(low, interval['max'] * 1.2):.2f}"
+        else:
+            doc[f"{key}_result"] = spec["alternatives"][0]["text"] if spec else "Complies"
+    return doc
+
+def perturb(content, rng):
+    """Copy a document with its plain numeric results scaled by up to +/-20%."""
+    doc = copy.deepcopy(content)
+    for key, value in doc.items():
+        if isinstance(value, str) and re.fullmatch(r"\s*\d+(\.\d+)?\s*", value):
+            doc[key] = f"{float(value) * rng.uniform(0.8, 1.2):.2f}"
+    return doc
+
+def pad(content, padding):
+    """Grow a document by `padding` unrelated fields, as long COAs have."""
+    doc = dict(content)
+    for i in range(padding):
+        doc[f"remark_{i}_note"] = f"Synthetic remark {i}"
+    return doc
+
+def build_corpus(parser, parser_name, fixtures, scale=1, padding=0, seed=0):
+    """
+    Documents for one parser: every fixture retargeted at it plus one
+    synthetic document, repeated `scale` times with perturbed values.
+    """
+    rng = random.Random(seed)
+    base = [retarget(content, parser_name) for content in fixtures]
+    with quiet():
+        base.append(synthetic_document(parser, parser_name, rng))
+    corpus = [pad(doc, padding) for doc in base]
+    for _ in range(scale - 1):
+        corpus.extend(pad(perturb(doc, rng), padding) for doc in base)
+    return [json.dumps({"content": doc}) for doc in corpus]
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures.append(json.load(f).get("content", {}))
+    return fixtures
+
+# === MEASUREMENT ===
+def run_round(parser, corpus, work_dir):
+    """Run every document through each stage once; returns seconds per stage."""
+    totals = dict.fromkeys(STAGES, 0.0)
+    json_file = os.path.join(work_dir, "bench.json")
+    for raw in corpus:
+        start = time.perf_counter()
+        content = json.loads(raw).get("content", {})
+        totals["load"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        parser.resolve(content)
+        totals["resolve"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        evaluation = parser.evaluate(content)
+        totals["evaluate"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        report_path = parser.write_report(evaluation, json_file)
+        totals["report"] += time.perf_counter() - start
+        os.remove(report_path)
+    return totals
+
+def peak_memory(parser, corpus, work_dir):
+    """Peak traced allocation (bytes) while evaluating and reporting the corpus."""
+    json_file = os.path.join(work_dir, "bench.json")
+    tracemalloc.start()
+    try:
+        for raw in corpus:
+            evaluation = parser.evaluate(json.loads(raw).get("content", {}))
+            os.remove(parser.write_report(evaluation, json_file))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_parser(parser, corpus, rounds, work_dir):
+    """
+    Time `rounds` passes over the corpus after one warm-up pass.
+    Stage times come from the fastest round (least disturbed by other load);
+    evaluate includes resolve, and docs/s counts the evaluate and report
+    stages, as a real upload runs them.
+    """
+    with quiet():
+        run_round(parser, corpus, work_dir)
+        samples = [run_round(parser, corpus, work_dir) for _ in range(rounds)]
+        peak = peak_memory(parser, corpus, work_dir)
+
+    best = min(samples, key=lambda s: s["evaluate"] + s["report"])
+    stages = {stage: best[stage] for stage in STAGES}
+    busy = stages["evaluate"] + stages["report"]
+    return {
+        "documents": len(corpus),
+        "docs_per_sec": len(corpus) / busy if busy else 0.0,
+        "stage_ms_per_doc": {stage: stages[stage] * 1000 / len(corpus) for stage in STAGES},
+        "peak_memory_bytes": peak,
+    }
+
+# === BASELINE ===
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print the change against a saved baseline; returns the regressed parsers."""
+    regressed = []
+    print(f"\n[BENCH] Compared to baseline from {baseline.get('created', '?')}")
+    for name, current in results["parsers"].items():
+        previous = baseline.get("parsers", {}).get(name)
+        if not previous:
+            print(f"[BENCH] {name:<24} no baseline")
+            continue
+        change = current["docs_per_sec"] / previous["docs_per_sec"] - 1 if previous["docs_per_sec"] else 0.0
+        memory = current["peak_memory_bytes"] / previous["peak_memory_bytes"] - 1 if previous["peak_memory_bytes"] else 0.0
+        flag = "REGRESSION" if change < -tolerance else "ok"
+        print(f"[BENCH] {name:<24} docs/s {change:+.1%}  peak memory {memory:+.1%}  {flag}")
+        if change < -tolerance:
+            regressed.append(name)
+    return regressed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the supplier parsers over fixture and synthetic COAs.")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="directory of saved Nanonets JSON files")
+    parser.add_argument("--parsers", nargs="*", default=parser_registry.PARSER_MODULES, help="parser modules to benchmark")
+    parser.add_argument("--scale", type=int, default=20, help="repeat the corpus this many times with perturbed values")
+    parser.add_argument("--padding", type=int, default=0, help="extra unrelated fields added to every document")
+    parser.add_argument("--rounds", type=int, default=5, help="timed passes over the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed docs/s drop before flagging a regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    with quiet():
+        parsers = parser_registry.load_parsers()
+    fixtures = load_fixtures(args.fixtures)
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {"scale": args.scale, "padding": args.padding, "rounds": args.rounds, "fixtures": len(fixtures)},
+        "parsers": {},
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="bench_parsers_")
+    try:
+        print(f"[BENCH] {len(fixtures)} fixtures, scale {args.scale}, padding {args.padding}, {args.rounds} rounds")
+        print(f"[BENCH] {'parser':<24} {'docs':>6} {'docs/s':>9} " + " ".join(f"{s + ' ms':>12}" for s in STAGES) + f" {'peak KiB':>10}")
+        for name in args.parsers:
+            parser = parsers.get(name)
+            if parser is None:
+                print(f"[BENCH] {name:<24} not loaded, skipped")
+                continue
+            corpus = build_corpus(parser, name, fixtures, args.scale, args.padding, args.seed)
+            result = bench_parser(parser, corpus, args.rounds, work_dir)
+            results["parsers"][name] = result
+            stage_cols = " ".join(f"{result['stage_ms_per_doc'][s]:>12.3f}" for s in STAGES)
+            print(f"[BENCH] {name:<24} {result['documents']:>6} {result['docs_per_sec']:>9.1f} {stage_cols} {result['peak_memory_bytes'] / 1024:>10.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressed = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != results["settings"]:
+            print(f"[BENCH] Baseline settings differ ({baseline.get('settings')}), comparison is indicative only")
+        regressed = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] Baseline saved to {args.baseline}")
+
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+
+import httpx
+
+import ocr_client
+import ocr_resilience
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PDF = os.path.join(BASE_DIR, "docs", "3439 COA - 2030CE080412 - amol Kate.pdf")
+
+# Policies compared, from no protection to retries plus hedging
+POLICIES = {
+    "none": dict(max_attempts=1, hedge=False),
+    "retry": dict(max_attempts=ocr_resilience.MAX_ATTEMPTS, hedge=False),
+    "retry+hedge": dict(max_attempts=ocr_resilience.MAX_ATTEMPTS, hedge=True),
+}
+
+def percentile(values, pct):
+    """Nearest-rank percentile, as nanoNets' batch summary reports it."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100.0 * len(ordered))) - 1]
+
+def stub_stats(url):
+    """Request counters of nanonets_stub.py, or None for a real endpoint."""
+    try:
+        return httpx.get(url.rsplit("/", 1)[0] + "/stats", timeout=5).json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+async def run_policy(name, pdf_path, requests, concurrency, url):
+    """Send `requests` uploads through one policy; returns latency and outcome figures."""
+    ocr_resilience.policy = ocr_resilience.Policy(
+        **POLICIES[name],
+        # The breaker would turn injected errors into fast failures and skew the comparison
+        breaker=ocr_resilience.CircuitBreaker(failures=10 ** 9),
+    )
+    ocr_client.NANONETS_URL = url
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await ocr_client.extract(os.path.basename(pdf_path), pdf_path)
+                latencies.append(time.perf_counter() - start)
+            except (httpx.HTTPError, ocr_resilience.CircuitOpenError):
+                failures += 1
+
+    before = stub_stats(url)
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    after = stub_stats(url)
+    await ocr_client.close_client()
+
+    return {
+        "policy": name,
+        "requests": requests,
+        "failed": failures,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "wall_seconds": elapsed,
+        "upstream_calls": after["requests"] - before["requests"] if before and after else None,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare OCR tail latency and failures with and without retries/hedging. "
+                    "Start nanonets_stub.py with injected latency/errors first, e.g. "
+                    "STUB_LATENCY=lognormal:-1,0.8 STUB_ERROR_RATE=0.05 python nanonets_stub.py --port 8001")
+    parser.add_argument("--url", default="http://127.0.0.1:8001/extract", help="Nanonets /extract URL (default: local stub)")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="PDF uploaded on every request")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--policies", nargs="*", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"[BENCH] {args.requests} requests, concurrency {args.concurrency}, against {args.url}")
+    rows = []
+    for name in args.policies:
+        row = asyncio.run(run_policy(name, args.pdf, args.requests, args.concurrency, args.url))
+        rows.append(row)
+        calls = row["upstream_calls"] if row["upstream_calls"] is not None else "?"
+        print(f"[BENCH] {name:<12} failed {row['failed']:>4}  p50 {row['p50']:.2f}s  p95 {row['p95']:.2f}s  "
+              f"p99 {row['p99']:.2f}s  upstream calls {calls}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import requests
+
+import nanoNets
+import pdf_shrink
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOCS_DIR = os.path.join(BASE_DIR, "docs")
+
+def upload_seconds(path, url):
+    """Wall time of one real /extract request for the file at path, sent as nanoNets sends it."""
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        requests.post(url, headers=nanoNets.HEADERS, files={"file": (os.path.basename(path), f)},
+                      data={"output_type": "flat-json"}, timeout=nanoNets.REQUEST_TIMEOUT)
+    return time.perf_counter() - start
+
+def bench_file(pdf_path, uplink_mbps, url=None):
+    """
+    Shrink one PDF and compare the time to get it to Nanonets with and
+    without the stage. The upload time is modelled from the uplink speed;
+    with url set it is also measured against that endpoint.
+    """
+    shrink = pdf_shrink.shrink(pdf_path)
+    try:
+        bytes_per_sec = uplink_mbps * 1e6 / 8
+        row = {
+            "file": os.path.basename(pdf_path),
+            "original_bytes": shrink["original_bytes"],
+            "bytes": shrink["bytes"],
+            "applied": shrink["applied"],
+            "shrink_seconds": shrink["seconds"],
+            "upload_before": shrink["original_bytes"] / bytes_per_sec,
+            "upload_after": shrink["bytes"] / bytes_per_sec,
+        }
+        if url:
+            row["measured_before"] = upload_seconds(pdf_path, url)
+            row["measured_after"] = upload_seconds(shrink["path"], url)
+    finally:
+        pdf_shrink.discard(shrink)
+
+    # The shrink time is only paid when the stage is on, whatever it saves
+    row["latency_change"] = row["shrink_seconds"] + row["upload_after"] - row["upload_before"]
+    return row
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure what PDF shrinking saves on the way to Nanonets.")
+    parser.add_argument("paths", nargs="*", default=[DOCS_DIR], help="PDF files or directories (default: docs/)")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="uplink speed used to model upload time")
+    parser.add_argument("--url", default=None, help="also time real uploads against this /extract URL (e.g. nanonets_stub.py)")
+    parser.add_argument("--output", default=None, help="write the per-file results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not pdf_shrink.available():
+        print("[BENCH] PyMuPDF is not installed; nothing to measure")
+        return 1
+
+    files = []
+    for path in args.paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.pdf"))) if os.path.isdir(path) else [path])
+
+    print(f"[BENCH] {len(files)} PDFs, target {pdf_shrink.TARGET_DPI} dpi, quality {pdf_shrink.JPEG_QUALITY}, uplink {args.uplink_mbps} Mbit/s")
+    rows = []
+    for pdf_path in files:
+        row = bench_file(pdf_path, args.uplink_mbps, args.url)
+        rows.append(row)
+        measured = f"  measured {row['measured_before']:.2f}s -> {row['measured_after']:.2f}s" if args.url else ""
+        print(f"[BENCH] {row['file'][:40]:<40} {row['original_bytes'] / 1024:>8.0f} -> {row['bytes'] / 1024:>7.0f} KiB"
+              f"  shrink {row['shrink_seconds']:.2f}s  latency {row['latency_change']:+.2f}s{measured}")
+
+    if rows:
+        before = sum(r["original_bytes"] for r in rows)
+        after = sum(r["bytes"] for r in rows)
+        change = sum(r["latency_change"] for r in rows) / len(rows)
+        print(f"[BENCH] Total {before / 1024:.0f} -> {after / 1024:.0f} KiB ({1 - after / before:.1%} saved), "
+              f"mean end-to-end change {change:+.2f}s per PDF")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
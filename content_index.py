@@ -0,0 +1,50 @@
+import re
+
+def normalize(s):
+    return re.sub(r"[^a-z0-9]", "", str(s).lower()) if s else ""
+
+def normalize_aliases(param_aliases):
+    """Normalize every alias of a parser's alias table once, at import time."""
+    return {key: [normalize(a) for a in aliases] for key, aliases in param_aliases.items()}
+
+class ContentIndex:
+    """
+    Normalized view of one document's OCR content, built once per document.
+
+    Every content key is normalized up front; numbered parameter-name slots
+    (characteristic_1_name, test_parameter_1, ...) are normalized the first
+    time a parser asks for them. Resolved parameter results are memoized in
+    `results` so repeated lookups of the same parameter are dict hits.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.norm_keys = [(k, normalize(k)) for k in content]
+        self.result_keys = [(k, n) for k, n in self.norm_keys if n.endswith("result")]
+        self.by_norm = {}
+        for k, n in self.norm_keys:
+            self.by_norm.setdefault(n, []).append(k)
+        self.results = {}
+        self._slots = {}
+
+    def keys_for_norm(self, norm):
+        """Content keys whose normalized form equals norm, in document order."""
+        return self.by_norm.get(norm, [])
+
+    def name_slots(self, patterns, count=24):
+        """
+        Populated numbered slots for (name_pattern, result_pattern) pairs, in
+        pattern order: [(name_key, name_value, normalized_name, result_key)].
+        """
+        patterns = tuple(patterns)
+        if patterns not in self._slots:
+            slots = []
+            for name_pattern, result_pattern in patterns:
+                for i in range(1, count + 1):
+                    name_key = name_pattern.format(i)
+                    name_val = self.content.get(name_key)
+                    if not name_val:
+                        continue
+                    slots.append((name_key, name_val, normalize(name_val), result_pattern.format(i)))
+            self._slots[patterns] = slots
+        return self._slots[patterns]
@@ -6,6 +6,59 @@ import FileUpload from './FileUpload';
 import { ProcessingStatus } from './ProcessingStatus';
 import { UploadConfirmation } from './UploadConfirmation';
 
+const BACKEND_URL = 'https://pdf-ocr-backend-one.vercel.app';
+
+// Backend progress stages (GET /progress/{id}) shown as processing steps
+const STAGE_STATUS: Record<string, string> = {
+  received: 'parsing',
+  ocr_started: 'processing',
+  ocr_finished: 'processing',
+  parser_chosen: 'rules',
+  parameter: 'rules',
+  evaluated: 'rules',
+  report_ready: 'report',
+};
+
+// Follow the upload's stage events; resolves with a function that stops
+// following once subscribed. Backends without the stream (the serverless
+// deploy does not route /progress) or a second without it fall back to a
+// plain "processing" status, so the upload never waits on it.
+function followProgress(requestId: string, onStatus: (status: string) => void): Promise<() => void> {
+  if (typeof EventSource === 'undefined') {
+    onStatus('processing');
+    return Promise.resolve(() => {});
+  }
+  const source = new EventSource(`${BACKEND_URL}/progress/${requestId}`);
+  Object.entries(STAGE_STATUS).forEach(([stage, status]) => {
+    source.addEventListener(stage, () => onStatus(status));
+  });
+  return new Promise((resolve) => {
+    let settled = false;
+    const settle = (live: boolean) => {
+      if (settled) return;
+      settled = true;
+      if (!live) {
+        source.close();
+        onStatus('processing');
+      }
+      resolve(() => source.close());
+    };
+    source.addEventListener('subscribed', () => settle(true));
+    // Also fires when the stream ends; do not let EventSource reconnect
+    source.onerror = () => {
+      source.close();
+      settle(false);
+    };
+    setTimeout(() => settle(false), 1000);
+  });
+}
+
+function newRequestId(): string {
+  return typeof crypto !== 'undefined' && crypto.randomUUID
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
 export function UploadFlow() {
   const [currentStep, setCurrentStep] = useState(1);
   const [selectedProduct, setSelectedProduct] = useState<string>('');
@@ -43,16 +96,16 @@ export function UploadFlow() {
     setCurrentStep(4);
     setProcessingStatus('parsing');
 
+    const requestId = newRequestId();
+    const stopProgress = await followProgress(requestId, setProcessingStatus);
     try {
       const formData = new FormData();
       formData.append('file', file);
 
-      // Simulate parsing delay
-      await new Promise((r) => setTimeout(r, 500));
-
       // Call backend
-      const res = await fetch('https://pdf-ocr-backend-one.vercel.app/upload-pdf/', {
+      const res = await fetch(`${BACKEND_URL}/upload-pdf/`, {
         method: 'POST',
+        headers: { 'X-Request-ID': requestId },
         body: formData,
       });
 
@@ -75,17 +128,6 @@ export function UploadFlow() {
       }
 
       setHtmlReport(report);
-
-      // Simulate processing steps
-      setProcessingStatus('processing');
-      await new Promise((r) => setTimeout(r, 1200));
-      
-      setProcessingStatus('rules');
-      await new Promise((r) => setTimeout(r, 1400));
-      
-      setProcessingStatus('report');
-      await new Promise((r) => setTimeout(r, 1200));
-      
       setProcessingStatus('complete');
       setReportId('RPT-' + Date.now());
 
@@ -93,6 +135,8 @@ export function UploadFlow() {
       console.error('Upload error:', err);
       setProcessingStatus('error');
       setError(err instanceof Error ? err.message : 'An error occurred during upload');
+    } finally {
+      stopProgress();
     }
   };
 
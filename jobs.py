@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+# === CONFIG ===
+# Job state lives in a local SQLite file so queued and finished jobs survive a
+# worker restart; every call opens its own short-lived connection.
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(tempfile.gettempdir(), "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    pdf_path TEXT,
+    pdf_digest TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    timings TEXT,
+    result TEXT,
+    error TEXT
+)
+"""
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init():
+    """Create the jobs table if needed."""
+    os.makedirs(os.path.dirname(JOBS_DB) or ".", exist_ok=True)
+    with _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+def create(filename, pdf_path, pdf_digest):
+    """Record a new queued job for a spooled PDF and return its id."""
+    job_id = uuid.uuid4().hex
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, filename, pdf_path, pdf_digest, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, filename, pdf_path, pdf_digest, QUEUED, time.time()),
+        )
+    return job_id
+
+def get(job_id):
+    """Return the job as a dict (timings/result decoded), or None if unknown."""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def mark_running(job_id):
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+
+def requeue(job_id):
+    """Put a running job back to queued, keeping its spooled PDF."""
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE id = ?", (QUEUED, job_id))
+
+def finish(job_id, result, timings):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, timings = ?, result = ?, pdf_path = NULL WHERE id = ?",
+            (DONE, time.time(), json.dumps(timings), json.dumps(result, ensure_ascii=False), job_id),
+        )
+
+def fail(job_id, error, timings=None):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, timings = ?, error = ?, pdf_path = NULL WHERE id = ?",
+            (FAILED, time.time(), json.dumps(timings or {}), error, job_id),
+        )
+
+def unfinished():
+    """
+    Jobs a previous worker accepted but never completed, oldest first.
+    Running jobs are put back to queued since their worker is gone.
+    """
+    with _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+        rows = conn.execute(
+            "SELECT id, filename, pdf_path, pdf_digest FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+        ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,67 @@
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# === KEYS CACHE ===
+# keys.txt path -> (mtime, {normalized product_company key: [mandatory parameters]})
+_cache = {}
+_lock = threading.Lock()
+
+def normalize_key(name):
+    """Normalize a product/company key the way keys.txt entries are matched."""
+    return name.strip().strip('"').replace(" ", "_").replace("-", "_").lower()
+
+def _parse_file(path):
+    index = {}
+    warnings = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if "- Mandatory Values -" not in line:
+                continue
+            product_part, keys_part = line.split("- Mandatory Values -", 1)
+            key = normalize_key(product_part)
+            keys_match = re.search(r"\{(.*?)\}", keys_part)
+            keys_list = [k.strip().strip('"').strip("'") for k in keys_match.group(1).split(",")] if keys_match else []
+
+            if key in index:
+                if index[key] == keys_list:
+                    warnings.append(f"{os.path.basename(path)}:{line_no}: duplicate entry {product_part.strip()}")
+                else:
+                    warnings.append(f"{os.path.basename(path)}:{line_no}: conflicting entry {product_part.strip()} ignored, first definition wins")
+                continue
+            index[key] = keys_list
+    return index, warnings
+
+def load(path):
+    """
+    Return the {normalized key: mandatory parameters} index for a keys file.
+    Parsed once and reloaded only when the file's mtime changes; duplicate and
+    conflicting entries are reported when the file is (re)loaded.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    path = os.path.abspath(path)
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index, warnings = _parse_file(path)
+        for warning in warnings:
+            logger.warning(warning)
+        logger.info("Loaded %d product/company entries from %s", len(index), os.path.basename(path))
+        _cache[path] = (mtime, index)
+        return index
+
+def get_mandatory_keys(path, product_company_key):
+    """Mandatory parameters for a product_company key, or [] if not listed."""
+    return list(load(path).get(normalize_key(product_company_key), []))
@@ -0,0 +1,249 @@
+import logging
+import os
+import re
+import time
+
+import metrics
+import parser_registry
+
+# PyMuPDF is optional; without it every PDF goes to Nanonets. It is imported
+# with the first PDF, not at startup, to keep it out of serverless cold starts.
+_pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Digital (non-scanned) COAs carry a text layer that can be read locally,
+# skipping the Nanonets round trip. Scans and low-confidence reads fall back.
+ENABLED = os.environ.get("LOCAL_EXTRACT", "1") == "1"
+MIN_CONFIDENCE = float(os.environ.get("LOCAL_EXTRACT_MIN_CONFIDENCE", "0.8"))
+# Fewer characters per page than this means a scan (or a stray OCR layer)
+MIN_TEXT_CHARS = int(os.environ.get("LOCAL_EXTRACT_MIN_CHARS", "200"))
+MAX_PAGES = int(os.environ.get("LOCAL_EXTRACT_MAX_PAGES", "10"))
+
+# Words further apart than this many points start a new table cell
+CELL_GAP = 8.0
+# Words whose vertical centres are this close (points) share a row
+ROW_TOLERANCE = 3.0
+
+# Header labels of the COA, mapped to the flat-json keys Nanonets produces
+HEADER_LABELS = {
+    "product_name": ["product name", "name of product", "product", "material name", "material"],
+    "company_name": ["supplier name", "supplier", "manufacturer", "manufactured by", "company name", "company"],
+    "batch_number": ["batch number", "batch no", "batch", "lot number", "lot no", "lot"],
+    "date_of_manufacturing": ["date of manufacturing", "date of manufacture", "manufacturing date", "mfg date", "mfg. date"],
+    "date_of_expiry": ["date of expiry", "expiry date", "best before", "exp date", "exp. date"],
+}
+
+# Column headings of the results table, mapped to flat-json key suffixes
+COLUMN_LABELS = {
+    "name": ["parameter", "parameters", "test parameter", "test parameters", "characteristic", "characteristics", "test", "tests", "analysis", "particulars"],
+    "result": ["result", "results", "observed results", "observed result", "observation", "observations", "actual", "value"],
+    "limit": ["specification", "specifications", "limit", "limits", "standard", "spec", "specs", "acceptance criteria"],
+    "uom": ["unit", "units", "uom"],
+    "test_method": ["method", "test method", "methods", "reference test method"],
+}
+
+COMPANY_HINT = re.compile(r"\b(ltd|limited|inc|llc|pvt|gmbh|corp|corporation|company|industries|foods)\b\.?", re.I)
+
+def _load_pymupdf():
+    """The pymupdf module, imported on first use; False when not installed."""
+    global _pymupdf
+    if _pymupdf is None:
+        try:
+            import pymupdf
+        except ImportError:
+            pymupdf = False
+        _pymupdf = pymupdf
+    return _pymupdf
+
+def available():
+    return bool(_load_pymupdf())
+
+def _snake(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+def _label(text):
+    return re.sub(r"[^a-z ]", "", text.lower()).strip()
+
+# === TEXT LAYER ===
+def _rows(page):
+    """
+    Words of one page grouped into rows (top to bottom) of cells (left to
+    right); every cell is (x0, x1, text).
+    """
+    words = sorted(page.get_text("words"), key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    lines = []
+    for w in words:
+        centre = (w[1] + w[3]) / 2
+        if lines and abs(lines[-1][0] - centre) <= ROW_TOLERANCE:
+            lines[-1][1].append(w)
+        else:
+            lines.append([centre, [w]])
+
+    rows = []
+    for _, line in lines:
+        line.sort(key=lambda w: w[0])
+        cells = []
+        for x0, _, x1, _, text, *_ in line:
+            if cells and x0 - cells[-1][1] <= CELL_GAP:
+                cells[-1] = (cells[-1][0], x1, f"{cells[-1][2]} {text}")
+            else:
+                cells.append((x0, x1, text))
+        rows.append(cells)
+    return rows
+
+def _usable(text):
+    """Text that is mostly printable; broken font encodings come out as garbage."""
+    if not text:
+        return False
+    bad = sum(1 for c in text if c == "�" or (not c.isprintable() and not c.isspace()))
+    return bad / len(text) < 0.05
+
+# === CONTENT ===
+def _header_fields(rows, content):
+    """Fill the product/company/batch fields from "Label: value" cells."""
+    for cells in rows:
+        texts = [c[2] for c in cells]
+        for i, text in enumerate(texts):
+            label, _, value = text.partition(":")
+            label = _label(label)
+            for key, names in HEADER_LABELS.items():
+                if key in content or label not in names:
+                    continue
+                value = value.strip()
+                if not value and i + 1 < len(texts):
+                    value = texts[i + 1].strip(" :")
+                if value:
+                    content[key] = value
+                break
+
+def _header_columns(cells):
+    """Column role -> x-centre when this row is the results table heading."""
+    columns = {}
+    for x0, x1, text in cells:
+        label = _label(text)
+        for role, names in COLUMN_LABELS.items():
+            if role not in columns and label in names:
+                columns[role] = (x0 + x1) / 2
+                break
+    return columns if "name" in columns and "result" in columns else None
+
+def _table_fields(rows, content):
+    """
+    Turn the rows under a results-table heading into <param>_result,
+    <param>_limit, ... keys. Each cell goes to the nearest heading column.
+    Returns the number of parameter rows read.
+    """
+    found = 0
+    columns = None
+    for cells in rows:
+        heading = _header_columns(cells)
+        if heading:
+            columns = heading
+            continue
+        if columns is None or len(cells) < 2:
+            continue
+
+        row = {}
+        for x0, x1, text in cells:
+            role = min(columns, key=lambda r: abs(columns[r] - (x0 + x1) / 2))
+            row[role] = f"{row[role]} {text}" if role in row else text
+        name = _snake(row.get("name", ""))
+        if not name or not row.get("result") or not re.search(r"[a-z]", name):
+            continue
+        for role, value in row.items():
+            if role != "name":
+                content[f"{name}_{role}"] = value.strip()
+        found += 1
+    return found
+
+def _company_fallback(rows):
+    """First line of the letterhead that looks like a company name."""
+    for cells in rows[:8]:
+        line = " ".join(c[2] for c in cells)
+        if COMPANY_HINT.search(line):
+            return line.strip()
+    return None
+
+def _confidence(content, params):
+    """
+    How far the local read can be trusted. With a supplier parser for the
+    document, the share of its mandatory parameters that resolve; otherwise
+    a structural score from the header fields and table rows found, kept
+    below MIN_CONFIDENCE since nothing checks that the read is right.
+    """
+    parser = parser_registry.detect_parser(content)
+    if parser is not None:
+        resolved = parser.resolve(content)["params"]
+        return sum(1 for _, result, _ in resolved if result is not None) / len(resolved) if resolved else 0.0
+    score = 0.3 * ("product_name" in content) + 0.3 * ("company_name" in content)
+    score += 0.4 * min(params, 5) / 5
+    # Still logged, to show how close unknown suppliers come
+    return score * 0.99 * MIN_CONFIDENCE
+
+def extract(pdf_path):
+    """
+    Read a COA from the PDF's own text layer.
+    Returns {"content", "confidence", "pages", "reason"}; content is None
+    when the PDF has no usable text layer (scans).
+    """
+    doc = _load_pymupdf().open(pdf_path)
+    try:
+        pages = list(doc)[:MAX_PAGES]
+        texts = [page.get_text("text") for page in pages]
+        if not pages or sum(len(t.strip()) for t in texts) < MIN_TEXT_CHARS * len(pages):
+            return {"content": None, "confidence": 0.0, "pages": len(pages), "reason": "no text layer"}
+        if not _usable("".join(texts)):
+            return {"content": None, "confidence": 0.0, "pages": len(pages), "reason": "unreadable text layer"}
+        rows = [row for page in pages for row in _rows(page)]
+    finally:
+        doc.close()
+
+    content = {}
+    _header_fields(rows, content)
+    if "company_name" not in content:
+        company = _company_fallback(rows)
+        if company:
+            content["company_name"] = company
+    params = _table_fields(rows, content)
+    return {"content": content, "confidence": _confidence(content, params), "pages": len(pages), "reason": f"{params} parameters"}
+
+def maybe_extract(pdf_path):
+    """
+    Nanonets-shaped response ({"success", "content", ...}) read locally, or
+    None when disabled, unavailable, scanned or below MIN_CONFIDENCE.
+    """
+    if not ENABLED or not available():
+        return None
+
+    start = time.perf_counter()
+    try:
+        local = extract(pdf_path)
+    except Exception as e:
+        metrics.LOCAL_EXTRACT.observe(time.perf_counter() - start, outcome="error")
+        logger.warning("Local extraction failed for %s: %s", os.path.basename(pdf_path), e)
+        return None
+    seconds = time.perf_counter() - start
+
+    if local["content"] is None:
+        outcome = "no_text"
+    elif local["confidence"] < MIN_CONFIDENCE:
+        outcome = "low_confidence"
+    else:
+        outcome = "hit"
+    metrics.LOCAL_EXTRACT.observe(seconds, outcome=outcome)
+    logger.info("Local extraction %s for %s (%s, confidence %.2f) in %.3fs", outcome, os.path.basename(pdf_path),
+                local["reason"], local["confidence"], seconds, extra={"confidence": local["confidence"]})
+    if outcome != "hit":
+        return None
+
+    return {
+        "success": True,
+        "content": local["content"],
+        "format": "flat-json",
+        "pages_processed": local["pages"],
+        "processing_time": seconds,
+        "backend": "local",
+        "confidence": local["confidence"],
+    }
@@ -0,0 +1,137 @@
+import contextlib
+import threading
+import time
+
+# === REGISTRY ===
+# Minimal Prometheus-style counters, gauges and histograms, rendered in the text
+# exposition format by render(). Label values are passed as keyword arguments.
+_registry = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, even when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(bound))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === PIPELINE METRICS ===
+UPLOAD_READ = Histogram("pdf_upload_read_seconds", "Time spent reading and spooling the uploaded PDF")
+PDF_SHRINK = Histogram("pdf_shrink_seconds", "Time spent shrinking PDFs before OCR", ["outcome"])
+PDF_SHRINK_SAVED = Counter("pdf_shrink_saved_bytes_total", "Bytes not uploaded to Nanonets thanks to PDF shrinking")
+LOCAL_EXTRACT = Histogram("local_extract_seconds", "Time spent reading PDF text layers locally, by outcome (hit = Nanonets skipped)", ["outcome"])
+NANONETS_LATENCY = Histogram("nanonets_request_seconds", "Nanonets /extract request latency", ["status"])
+NANONETS_REQUESTS = Counter("nanonets_requests_total", "Nanonets /extract requests by HTTP status (or 'error' for transport failures)", ["status"])
+EXTRACT_BACKEND = Counter("extract_backend_total", "Uploads by the backend that produced their content (cache, local or nanonets)", ["backend"])
+SINGLE_FLIGHT_JOINED = Counter("single_flight_joined_total", "Uploads that shared an identical in-flight upload (process: whole pipeline, host: OCR result)", ["scope"])
+SINGLE_FLIGHT_SAVED = Counter("single_flight_saved_calls_total", "Nanonets calls avoided by waiting on an identical in-flight upload", ["scope"])
+SINGLE_FLIGHT_WAIT = Histogram("single_flight_wait_seconds", "Time spent waiting on an identical in-flight upload", ["scope"])
+OCR_RETRIES = Counter("ocr_retries_total", "Nanonets attempts retried, by HTTP status or exception", ["reason"])
+OCR_HEDGES = Counter("ocr_hedge_wins_total", "Hedged Nanonets calls, by which request answered first", ["winner"])
+OCR_CIRCUIT = Counter("ocr_circuit_transitions_total", "Nanonets circuit breaker state changes, by new state", ["state"])
+OCR_CIRCUIT_REJECTED = Counter("ocr_circuit_rejected_total", "Nanonets calls refused while the circuit was open")
+OCR_CACHE = Counter("ocr_cache_lookups_total", "OCR cache lookups", ["result"])
+JSON_SAVE = Histogram("json_save_seconds", "Time spent writing the Nanonets JSON to disk")
+PARSER_DISPATCH = Histogram("parser_dispatch_seconds", "Time spent picking the supplier parser", ["parser"])
+PARSER_RUN = Histogram("parser_run_seconds", "Supplier parser evaluation and report time", ["parser"])
+REPORT_LOAD = Histogram("report_load_seconds", "Time spent reading the HTML report back", ["parser"])
+DISK_BYTES = Gauge("retention_disk_bytes", "Bytes held in each retention-managed directory at the last sweep", ["directory"])
+DISK_FILES = Gauge("retention_disk_files", "Files in each retention-managed directory at the last sweep", ["directory"])
+RETENTION_REMOVED = Counter("retention_removed_files_total", "Files removed by retention, by directory and reason (age or size)", ["directory", "reason"])
+RETENTION_FREED = Counter("retention_freed_bytes_total", "Bytes freed by retention", ["directory"])
+RETENTION_SWEEP = Histogram("retention_sweep_seconds", "Time spent sweeping the retention-managed directories")
+REQUEST_TOTAL = Histogram("upload_request_seconds", "Total time of an upload, from first byte to response", ["endpoint", "parser", "outcome"])
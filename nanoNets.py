@@ -1,15 +1,34 @@
+import argparse
+import math
 import os
+import signal
 import sys
+import threading
+import time
 import requests
 import json
-import subprocess
+import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import applog
+import local_extract
+import ocr_cache
+import ocr_resilience
+import parser_registry
+import pdf_shrink
+import pdf_watch
+import results_store
+import retention
+import single_flight
 
 # Fix Windows encoding issue
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+logger = logging.getLogger(__name__)
+
 # === CONFIG ===
 
 CURRENT_DIR = os.getcwd()
@@ -20,13 +39,42 @@ json_dir = os.path.join(CURRENT_DIR, "output")
 os.makedirs(INPUT_DIR, exist_ok=True)
 os.makedirs(json_dir, exist_ok=True)
 
-print(f"[DEBUG] TEMP_DIR: {CURRENT_DIR}")
-print(f"[DEBUG] INPUT_DIR: {INPUT_DIR}")
-print(f"[DEBUG] json_dir: {json_dir}")
 
-API_KEY = "dcc5b694-96c8-11f0-b983-1ad2fa14c17a"
-URL = "https://extraction-api.nanonets.com/extract"
+# NANONETS_URL can point at a local stand-in (see nanonets_stub.py)
+API_KEY = os.environ.get("NANONETS_API_KEY", "dcc5b694-96c8-11f0-b983-1ad2fa14c17a")
+URL = os.environ.get("NANONETS_URL", "https://extraction-api.nanonets.com/extract")
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+# (connect, read) seconds; a hung request counts as a failed attempt
+REQUEST_TIMEOUT = (float(os.environ.get("OCR_CONNECT_TIMEOUT", "10")), float(os.environ.get("OCR_READ_TIMEOUT", "60")))
+
+# Nanonets quota for batch mode: sustained requests per second and burst size
+RATE_LIMIT = float(os.environ.get("NANONETS_RATE_LIMIT", "2"))
+RATE_BURST = int(os.environ.get("NANONETS_RATE_BURST", "4"))
+
+# === RATE LIMITING ===
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a token is available.
+    Refills at `rate` tokens per second up to `capacity`.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
 # === UTILITIES ===
 def normalize_content(content):
@@ -55,30 +103,46 @@ def extract_keywords(name):
     return words[0].strip()
 
 # === PROCESS PDF ===
-def process_pdf(pdf_path):
-    filename = os.path.basename(pdf_path)
-    name_without_ext = os.path.splitext(filename)[0]
-    output_path = os.path.join(json_dir, f"{name_without_ext}.json")
+def output_path_for(pdf_path):
+    """The normalized JSON saved for a PDF (its report is written next to it)."""
+    return os.path.join(json_dir, os.path.splitext(os.path.basename(pdf_path))[0] + ".json")
 
-    print(f"\n[PROCESS] Processing: {filename}")
-    print(f"[DEBUG] PDF path: {pdf_path}")
-    print(f"[DEBUG] Output path: {output_path}")
+def request_ocr(pdf_path, filename, cache_key, rate_limiter=None):
+    """Send one PDF to Nanonets; returns the decoded response, or None on failure."""
+    # Optionally downsample oversized scans before the upload
+    shrink = pdf_shrink.maybe_shrink(pdf_path)
 
-    # Send PDF to Nanonets API
-    try:
-        with open(pdf_path, "rb") as f:
-            files = {"file": f}
+    def send():
+        # Every attempt (retry or hedge) spends a rate-limit token
+        if rate_limiter:
+            rate_limiter.acquire()
+        with open(shrink["path"], "rb") as f:
+            files = {"file": (filename, f)}
             data = {"output_type": "flat-json"}
-            response = requests.post(URL, headers=HEADERS, files=files, data=data)
+            return requests.post(URL, headers=HEADERS, files=files, data=data, timeout=REQUEST_TIMEOUT)
+
+    # Send PDF to Nanonets API; retries and hedging per ocr_resilience, and
+    # while the circuit is open the batch waits for Nanonets to recover
+    try:
+        response = ocr_resilience.policy.call(
+            send, retry_on=(requests.ConnectionError, requests.Timeout), wait_when_open=True
+        )
     except Exception as e:
-        print(f"[ERROR] Error reading file: {e}")
-        return
+        logger.error("Error reading file: %s", e)
+        return None
+    finally:
+        pdf_shrink.discard(shrink)
+
+    # An error body (rate limit, outage, bad request) is not OCR data
+    if not response.ok:
+        logger.error("Nanonets API error for %s: HTTP %d %s", filename, response.status_code, response.text[:500])
+        return None
 
     try:
         response_data = response.json()
     except ValueError:
-        print(f"[ERROR] Response is not valid JSON for {filename}")
-        return
+        logger.error("Response is not valid JSON for %s", filename)
+        return None
 
     # Decode content if it's a string
     if "content" in response_data and isinstance(response_data["content"], str):
@@ -87,6 +151,52 @@ def process_pdf(pdf_path):
         except json.JSONDecodeError:
             pass
 
+    ocr_cache.put(cache_key, response_data)
+    return response_data
+
+def process_pdf(pdf_path, rate_limiter=None):
+    """
+    OCR one PDF, save the normalized JSON and run the matching parser.
+    Returns True on success, False if any step failed.
+    """
+    filename = os.path.basename(pdf_path)
+    output_path = output_path_for(pdf_path)
+
+    applog.new_request_id()
+    logger.info("Processing: %s", filename)
+    logger.debug("PDF path: %s | Output path: %s", pdf_path, output_path)
+
+    # Identical PDFs reuse the cached Nanonets response
+    try:
+        pdf_digest = ocr_cache.file_digest(pdf_path)
+        cache_key = ocr_cache.cache_key(pdf_digest, "flat-json")
+    except Exception as e:
+        logger.error("Error reading file: %s", e)
+        return False
+
+    started = time.perf_counter()
+    backend = "cache"
+    response_data = ocr_cache.get(cache_key)
+    if response_data is not None:
+        logger.info("OCR cache hit for %s", filename)
+    else:
+        logger.debug("OCR cache miss for %s", filename)
+        # The API or another run may be sending the same PDF to Nanonets right
+        # now; wait for it and reuse the response it caches
+        with single_flight.file_lock(cache_key) as waited:
+            response_data = ocr_cache.get(cache_key) if waited else None
+            if response_data is not None:
+                logger.info("Reused OCR result of a concurrent run for %s", filename)
+            else:
+                # Digital PDFs are read locally, without a Nanonets request
+                backend = "local"
+                response_data = local_extract.maybe_extract(pdf_path)
+                if response_data is None:
+                    backend = "nanonets"
+                    response_data = request_ocr(pdf_path, filename, cache_key, rate_limiter)
+                    if response_data is None:
+                        return False
+
     # Normalize content
     if "content" in response_data:
         response_data["content"] = normalize_content(response_data["content"])
@@ -95,7 +205,7 @@ def process_pdf(pdf_path):
     os.makedirs(json_dir, exist_ok=True)
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(response_data, f, ensure_ascii=False, indent=4)
-    print(f"[OK] Saved JSON: {output_path}")
+    logger.debug("Saved JSON: %s", output_path)
 
     # Extract product and company
     content = response_data.get("content", {})
@@ -105,44 +215,167 @@ def process_pdf(pdf_path):
     # Dynamic keywords
     product_key = extract_keywords(product_name)
     company_key = extract_keywords(company_name)
-    print(f"[KEYWORDS] Dynamic keywords: Product='{product_key}', Company='{company_key}'")
+    logger.info("Dynamic keywords: Product='%s', Company='%s'", product_key, company_key)
 
-    # Build parser filename and execute if exists
+    # Look up the parser and evaluate in-process if registered
+    evaluation, parser_name = None, None
     if product_key and company_key:
-        parser_file = f"{product_key}_{company_key}.py"
-        parser_path = os.path.join(os.getcwd(), parser_file)
+        parser_name = f"{product_key}_{company_key}"
 
-        if os.path.exists(parser_path):
+        if parser_registry.get_parser(product_key, company_key):
             try:
-                subprocess.run(["python", parser_path, output_path], check=True)
-                print(f"[PARSER] {parser_file} executed successfully for {filename}")
-            except subprocess.CalledProcessError as e:
-                print(f"[ERROR] Error running {parser_file} for {filename}: {e}")
+                evaluation = parser_registry.run_parser(product_key, company_key, output_path)
+                logger.info("%s executed successfully for %s", parser_name, filename)
+            except Exception as e:
+                logger.exception("Error running %s for %s: %s", parser_name, filename, e)
+                return False
         else:
-            print(f"[WARN] {parser_file} not found. Skipping parser execution for {filename}.")
+            logger.warning("%s not found. Skipping parser execution for %s.", parser_name, filename)
     else:
-        print(f"[WARN] No dynamic keywords found for {filename}. Parser not executed.")
+        logger.warning("No dynamic keywords found for %s. Parser not executed.", filename)
+
+    # Keep the outcome queryable after retention removes the output
+    try:
+        if evaluation:
+            evaluation = {k: v for k, v in evaluation.items() if k != "report_path"}
+        results_store.record(filename, pdf_digest, content, parser_name if evaluation else None, evaluation,
+                             {"total": time.perf_counter() - started}, backend)
+    except Exception as e:
+        logger.exception("Results store error for %s: %s", filename, e)
+
+    return True
+
+# === BATCH ===
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def timed_process(pdf_path, rate_limiter):
+    start = time.perf_counter()
+    try:
+        # A retention sweep (watch mode) leaves the PDF's JSON and report alone meanwhile
+        with retention.protect(output_path_for(pdf_path)):
+            ok = process_pdf(pdf_path, rate_limiter)
+    except Exception as e:
+        logger.exception("Unexpected error for %s: %s", os.path.basename(pdf_path), e)
+        ok = False
+    return ok, time.perf_counter() - start
+
+def print_summary(results, elapsed):
+    latencies = [latency for _, _, latency in results]
+    failures = [name for name, ok, _ in results if not ok]
+    print("\n[SUMMARY] ===============================")
+    print(f"[SUMMARY] Processed: {len(results)} | Succeeded: {len(results) - len(failures)} | Failed: {len(failures)}")
+    print(f"[SUMMARY] Wall time: {elapsed:.2f}s | Throughput: {len(results) / elapsed if elapsed else 0:.2f} PDFs/s")
+    print(f"[SUMMARY] Latency p50: {percentile(latencies, 50):.2f}s | p95: {percentile(latencies, 95):.2f}s")
+    for name in failures:
+        print(f"[SUMMARY] Failed: {name}")
 
 # === MAIN ===
-def main():
-    print(f"[DEBUG] Checking INPUT_DIR: {INPUT_DIR}")
-    print(f"[DEBUG] INPUT_DIR exists: {os.path.exists(INPUT_DIR)}")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OCR every PDF in pdf/ and run the matching supplier parser; "
+                                                 "done PDFs are moved to pdf/processed/ (or pdf/failed/).")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of PDFs processed in parallel (default: 1, serial)")
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT,
+                        help="Max Nanonets requests per second (default: %(default)s)")
+    parser.add_argument("--burst", type=int, default=RATE_BURST,
+                        help="Max Nanonets requests sent back to back (default: %(default)s)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process PDFs as they land in pdf/, moving them to pdf/processed/ "
+                             "(or pdf/failed/); --concurrency sets the worker count")
+    return parser.parse_args(argv)
+
+def watch(args, rate_limiter):
+    """Process PDFs as they arrive in INPUT_DIR until interrupted."""
+    results = []
+    results_lock = threading.Lock()
+
+    def handle(pdf_path):
+        ok, latency = timed_process(pdf_path, rate_limiter)
+        applog.set_request_id(None)
+        with results_lock:
+            results.append((os.path.basename(pdf_path), ok, latency))
+        logger.info("%s %s in %.2fs", os.path.basename(pdf_path), "done" if ok else "failed", latency)
+        return ok
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Service managers stop the watcher with SIGTERM; finish in-flight PDFs first
+    signal.signal(signal.SIGTERM, stop)
+    watcher = pdf_watch.PdfWatcher(INPUT_DIR, handle, workers=args.concurrency)
+    start = time.perf_counter()
+    watcher.start()
+    try:
+        while True:
+            time.sleep(retention.INTERVAL)
+            retention.sweep_all()
+    except KeyboardInterrupt:
+        logger.info("Stopping watch; waiting for PDFs in progress")
+    finally:
+        watcher.stop()
+    print_summary(results, time.perf_counter() - start)
+
+def main(argv=None):
+    args = parse_args(argv)
+    applog.setup()
+    logger.debug("INPUT_DIR: %s (exists: %s) | json_dir: %s", INPUT_DIR, os.path.exists(INPUT_DIR), json_dir)
+    parser_registry.load_parsers()
+    results_store.init()
     
     os.makedirs(json_dir, exist_ok=True)
+    rate_limiter = TokenBucket(args.rate, max(1, args.burst)) if args.rate > 0 else None
+    if args.watch:
+        watch(args, rate_limiter)
+        return
+
     pdf_files = [f for f in os.listdir(INPUT_DIR) if f.lower().endswith(".pdf")]
 
-    print(f"[DEBUG] Found PDF files: {pdf_files}")
-    print(f"[DEBUG] Number of PDFs: {len(pdf_files)}")
+    logger.debug("Found %d PDF files: %s", len(pdf_files), pdf_files)
 
     if not pdf_files:
-        print("[WARN] No PDF files found in input directory.")
+        logger.warning("No PDF files found in input directory.")
         return
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(INPUT_DIR, pdf_file)
-        process_pdf(pdf_path)
+    results = []
+    start = time.perf_counter()
+
+    if args.concurrency <= 1:
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(INPUT_DIR, pdf_file)
+            ok, latency = timed_process(pdf_path, rate_limiter)
+            results.append((pdf_file, ok, latency))
+    else:
+        logger.info("Processing %d PDFs with concurrency %d, rate %s/s", len(pdf_files), args.concurrency, args.rate)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = {
+                pool.submit(timed_process, os.path.join(INPUT_DIR, pdf_file), rate_limiter): pdf_file
+                for pdf_file in pdf_files
+            }
+            for future in as_completed(futures):
+                ok, latency = future.result()
+                results.append((futures[future], ok, latency))
+                logger.info("%d/%d done (%s: %.2fs)", len(results), len(pdf_files), futures[future], latency)
+
+    applog.set_request_id(None)
+    print_summary(results, time.perf_counter() - start)
 
-    print("\n[OK] All PDFs processed successfully.")
+    # Done PDFs leave pdf/ as in watch mode, so the next run only sees new
+    # ones; retention bounds what pdf/processed, pdf/failed and output/ keep
+    for pdf_file, ok, _ in results:
+        target_dir = os.path.join(INPUT_DIR, pdf_watch.PROCESSED_DIRNAME if ok else pdf_watch.FAILED_DIRNAME)
+        try:
+            pdf_watch.archive(os.path.join(INPUT_DIR, pdf_file), target_dir)
+        except OSError as e:
+            logger.error("Could not move %s out of pdf/: %s", pdf_file, e)
+    retention.sweep_all()
+    if all(ok for _, ok, _ in results):
+        print("\n[OK] All PDFs processed successfully.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
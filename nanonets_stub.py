@@ -0,0 +1,168 @@
+# Local stand-in for the Nanonets /extract endpoint.
+#
+# Replays recorded responses (check/*.json by default) keyed by the SHA-256 of
+# the uploaded PDF, with configurable latency and error injection, so the API
+# and the batch CLI can be load tested offline. Point the clients at it with
+#
+#     NANONETS_URL=http://127.0.0.1:8001/extract
+#
+# A recording is matched to a PDF by file stem (check/<name>.json pairs with
+# docs/<name>.pdf or pdf/<name>.pdf), or named after the PDF hash (<sha256>.json).
+import argparse
+import asyncio
+import contextlib
+import glob
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.responses import JSONResponse
+
+import applog
+
+applog.setup()
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RECORDINGS_DIR = os.environ.get("STUB_RECORDINGS_DIR", os.path.join(BASE_DIR, "check"))
+PDF_DIRS = os.environ.get("STUB_PDF_DIRS", os.pathsep.join([os.path.join(BASE_DIR, "docs"), os.path.join(BASE_DIR, "pdf")])).split(os.pathsep)
+
+# Latency distribution: fixed:S | uniform:LOW,HIGH | normal:MEAN,SD | lognormal:MU,SIGMA (seconds)
+LATENCY = os.environ.get("STUB_LATENCY", "fixed:0")
+# Fraction of requests answered with one of ERROR_STATUSES instead of a recording
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+ERROR_STATUSES = [int(s) for s in os.environ.get("STUB_ERROR_STATUSES", "500,502,503").split(",")]
+# Recording (file stem) served for PDFs without one; unset means 404
+DEFAULT_RECORDING = os.environ.get("STUB_DEFAULT_RECORDING", "")
+SEED = os.environ.get("STUB_SEED")
+
+OUTPUT_TYPES = {"flat-json"}
+
+# Recordings load on startup unless the CLI already loaded its own
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if not _recordings:
+        load_recordings()
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+_recordings = {}
+_default = None
+_random = random.Random(SEED)
+_stats = {"requests": 0, "replayed": 0, "default": 0, "unknown": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+# === RECORDINGS ===
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_recordings(recordings_dir=RECORDINGS_DIR, pdf_dirs=PDF_DIRS, default_recording=DEFAULT_RECORDING):
+    """Index every recording by the hash of its matching PDF."""
+    global _default
+    _recordings.clear()
+    by_stem = {}
+    for path in sorted(glob.glob(os.path.join(recordings_dir, "*.json"))):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            by_stem[stem] = json.load(f)
+        if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+            _recordings[stem] = by_stem[stem]
+
+    for pdf_dir in pdf_dirs:
+        for pdf_path in glob.glob(os.path.join(pdf_dir, "*.pdf")):
+            stem = os.path.splitext(os.path.basename(pdf_path))[0]
+            if stem in by_stem:
+                _recordings[_sha256(pdf_path)] = by_stem[stem]
+
+    _default = by_stem.get(default_recording) if default_recording else None
+    if default_recording and _default is None:
+        logger.warning("Default recording not found: %s", default_recording)
+    logger.info("%d recordings, %d matched to PDF hashes", len(by_stem), len(_recordings))
+    return _recordings
+
+def parse_latency(spec):
+    """Return a function giving one latency sample in seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda: _random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, _random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: _random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+_latency = parse_latency(LATENCY)
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+# === ENDPOINTS ===
+@app.post("/extract")
+async def extract(file: UploadFile = File(...), output_type: str = Form("flat-json")):
+    _count("requests")
+    if output_type not in OUTPUT_TYPES:
+        return JSONResponse(status_code=400, content={"error": f"Unsupported output_type: {output_type}"})
+
+    digest = hashlib.sha256()
+    while True:
+        chunk = await file.read(64 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+
+    await asyncio.sleep(_latency())
+
+    if ERROR_RATE and _random.random() < ERROR_RATE:
+        _count("errors")
+        return JSONResponse(status_code=_random.choice(ERROR_STATUSES), content={"error": "Injected error"})
+
+    recording = _recordings.get(digest.hexdigest())
+    if recording is not None:
+        _count("replayed")
+        return recording
+    if _default is not None:
+        _count("default")
+        return _default
+
+    _count("unknown")
+    logger.warning("No recording for %s (%s)", file.filename, digest.hexdigest())
+    return JSONResponse(status_code=404, content={"error": "No recorded response for this PDF"})
+
+@app.get("/stats")
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded Nanonets responses locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--recordings", default=RECORDINGS_DIR, help="directory of recorded JSON responses")
+    parser.add_argument("--latency", default=LATENCY, help="fixed:S, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="fraction of requests that fail")
+    parser.add_argument("--default", default=DEFAULT_RECORDING, help="recording stem served for unknown PDFs")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    ERROR_RATE = args.error_rate
+    _latency = parse_latency(args.latency)
+    load_recordings(args.recordings, PDF_DIRS, args.default)
+    logger.info("Serving on http://%s:%d/extract (latency %s, error rate %s)", args.host, args.port, args.latency, ERROR_RATE)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# One JSON file per (PDF hash, output_type); atomic renames make the directory
+# safe to share between worker processes.
+CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ocr_cache"))
+MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+MAX_AGE = float(os.environ.get("OCR_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+# evict() scans the whole directory, so put() runs it only every EVICT_EVERY
+# stores or EVICT_INTERVAL seconds; the limits can be overshot by that much
+EVICT_EVERY = int(os.environ.get("OCR_CACHE_EVICT_EVERY", "50"))
+EVICT_INTERVAL = float(os.environ.get("OCR_CACHE_EVICT_INTERVAL", "300"))
+
+CHUNK_SIZE = 64 * 1024
+
+# === KEYS ===
+def pdf_digest(pdf_content):
+    """SHA-256 hex digest of the PDF bytes."""
+    return hashlib.sha256(pdf_content).hexdigest()
+
+def file_digest(path):
+    """SHA-256 hex digest of a PDF on disk, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(digest, output_type="flat-json"):
+    safe_type = "".join(c if c.isalnum() else "_" for c in output_type)
+    return f"{digest}_{safe_type}"
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# === LOOKUP / STORE ===
+def get(key):
+    """
+    Return the cached OCR response for key, or None on a miss.
+    Hits refresh the entry's mtime so eviction is least-recently-used.
+    """
+    path = _entry_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > MAX_AGE:
+            _remove(path)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        os.utime(path)
+        return result
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Dropping unreadable entry %s: %s", key, e)
+        _remove(path)
+        return None
+
+_puts_since_evict = 0
+_last_evict = 0.0
+_evict_lock = threading.Lock()
+
+def _evict_due():
+    global _puts_since_evict, _last_evict
+    with _evict_lock:
+        _puts_since_evict += 1
+        now = time.monotonic()
+        if _puts_since_evict < EVICT_EVERY and now - _last_evict < EVICT_INTERVAL:
+            return False
+        _puts_since_evict, _last_evict = 0, now
+        return True
+
+def put(key, result):
+    """Store an OCR response; evicts old entries every so often (see EVICT_EVERY)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, _entry_path(key))
+    except Exception:
+        _remove(tmp_path)
+        raise
+    if _evict_due():
+        evict()
+
+def evict():
+    """Remove entries older than MAX_AGE, then least-recently-used ones until under MAX_BYTES."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    now = time.time()
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if now - st.st_mtime > MAX_AGE:
+            _remove(path)
+        else:
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_BYTES:
+            break
+        _remove(path)
+        total -= size
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import time
+
+import metrics
+import ocr_resilience
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+API_KEY = os.environ.get("NANONETS_API_KEY", "dcc5b694-96c8-11f0-b983-1ad2fa14c17a")
+NANONETS_URL = os.environ.get("NANONETS_URL", "https://extraction-api.nanonets.com/extract")
+HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+
+# Connection pool shared by every request handled by this worker
+POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", "10"))
+KEEPALIVE_EXPIRY = float(os.environ.get("OCR_KEEPALIVE_EXPIRY", "30"))
+
+# Per-phase timeouts in seconds; the read timeout covers the OCR processing time
+CONNECT_TIMEOUT = float(os.environ.get("OCR_CONNECT_TIMEOUT", "10"))
+WRITE_TIMEOUT = float(os.environ.get("OCR_WRITE_TIMEOUT", "30"))
+READ_TIMEOUT = float(os.environ.get("OCR_READ_TIMEOUT", "60"))
+POOL_TIMEOUT = float(os.environ.get("OCR_POOL_TIMEOUT", "30"))
+
+_client = None
+
+# httpx (with certifi) is imported with the first request rather than at
+# startup; callers catch ocr_client.HTTPError so they need not import it either
+def __getattr__(name):
+    if name == "HTTPError":
+        import httpx
+        return httpx.HTTPError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_client():
+    """Return the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=CONNECT_TIMEOUT,
+                read=READ_TIMEOUT,
+                write=WRITE_TIMEOUT,
+                pool=POOL_TIMEOUT,
+            ),
+        )
+    return _client
+
+async def close_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def extract(filename, pdf_content, output_type="flat-json"):
+    """
+    Send one PDF to Nanonets and return the decoded JSON response.
+    pdf_content may be bytes, a file path (opened for every attempt, so the
+    upload can be retried and hedged) or an open binary file (rewound before
+    a retry, never hedged). Goes through ocr_resilience.policy: retries,
+    optional hedging, and CircuitOpenError while Nanonets is down.
+    Raises httpx.HTTPError on transport errors and non-2xx statuses.
+    """
+    import httpx
+    data = {"output_type": output_type}
+
+    async def send():
+        if isinstance(pdf_content, (str, os.PathLike)):
+            with open(pdf_content, "rb") as f:
+                return await _post(filename, f, data)
+        if hasattr(pdf_content, "seek"):
+            pdf_content.seek(0)
+        return await _post(filename, pdf_content, data)
+
+    response = await ocr_resilience.policy.call_async(
+        send, retry_on=(httpx.TransportError,), hedgeable=not hasattr(pdf_content, "read")
+    )
+    response.raise_for_status()
+    result = response.json()
+
+    # Normalize content if needed
+    if "content" in result and isinstance(result["content"], str):
+        try:
+            result["content"] = json.loads(result["content"])
+        except json.JSONDecodeError:
+            pass
+
+    return result
+
+async def _post(filename, pdf_file, data):
+    """One timed POST to Nanonets."""
+    import httpx
+    files = {"file": (filename, pdf_file, "application/pdf")}
+    start = time.perf_counter()
+    try:
+        response = await get_client().post(NANONETS_URL, files=files, data=data)
+    except httpx.HTTPError:
+        metrics.NANONETS_LATENCY.observe(time.perf_counter() - start, status="error")
+        metrics.NANONETS_REQUESTS.inc(status="error")
+        raise
+    metrics.NANONETS_LATENCY.observe(time.perf_counter() - start, status=response.status_code)
+    metrics.NANONETS_REQUESTS.inc(status=response.status_code)
+    logger.info("Nanonets response status: %d", response.status_code, extra={"ocr_seconds": round(time.perf_counter() - start, 3)})
+    return response
@@ -0,0 +1,318 @@
+import asyncio
+import collections
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Retries: full-jitter exponential backoff on transport errors and these statuses
+MAX_ATTEMPTS = int(os.environ.get("OCR_MAX_ATTEMPTS", "3"))
+RETRY_BASE = float(os.environ.get("OCR_RETRY_BASE", "0.5"))
+RETRY_CAP = float(os.environ.get("OCR_RETRY_CAP", "10"))
+RETRY_STATUSES = {int(s) for s in os.environ.get("OCR_RETRY_STATUSES", "408,425,429,500,502,503,504").split(",")}
+
+# Hedging: when a request is slower than HEDGE_PERCENTILE of recent successful
+# requests, send a second copy and take whichever answers first. Every hedge
+# is a billed Nanonets call, so it is opt-in and capped at HEDGE_MAX_RATIO.
+HEDGE = os.environ.get("OCR_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("OCR_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.environ.get("OCR_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("OCR_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATIO = float(os.environ.get("OCR_HEDGE_MAX_RATIO", "0.1"))
+LATENCY_WINDOW = 200
+
+# Circuit breaker: open after this many consecutive failed attempts, then let
+# one trial request through every BREAKER_RESET seconds
+BREAKER_FAILURES = int(os.environ.get("OCR_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("OCR_BREAKER_RESET", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    """Nanonets is failing; the call was not attempted. Retry after retry_after seconds."""
+    def __init__(self, retry_after):
+        super().__init__(f"Nanonets circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        """Retry-After value: whole seconds, rounded up so clients do not come back early."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+# === CIRCUIT BREAKER ===
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _set(self, state):
+        if state != self.state:
+            logger.warning("Nanonets circuit %s -> %s", self.state, state)
+            self.state = state
+            metrics.OCR_CIRCUIT.inc(state=state)
+
+    def retry_after(self):
+        with self._lock:
+            return max(0.0, self._opened_at + self.reset - time.monotonic()) if self.state == OPEN else 0.0
+
+    def allow(self):
+        """True when a request may go out; half-open lets a single trial through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset:
+                    return False
+                self._set(HALF_OPEN)
+                self._trial = False
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._set(CLOSED)
+
+    def release(self):
+        """A trial that ended without an answer (cancelled) frees the slot."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == HALF_OPEN or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set(OPEN)
+
+# === POLICY ===
+class Policy:
+    """
+    Retry, hedging and circuit-breaking rules for one upstream, shared by the
+    async API client (call_async) and the threaded batch CLI (call).
+
+    `send()` performs one request and returns a response with `status_code`
+    and `headers`; exceptions listed in `retry_on` count as failed attempts.
+    The last response (or exception) is returned (or raised) unchanged once
+    attempts run out, so callers keep their own error handling.
+    """
+    def __init__(self, max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE, retry_cap=RETRY_CAP,
+                 hedge=HEDGE, hedge_percentile=HEDGE_PERCENTILE, hedge_max_ratio=HEDGE_MAX_RATIO,
+                 breaker=None, rng=None):
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self._rng = rng or random.Random()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self._calls = 0
+        self._hedge_count = 0
+        self._lock = threading.Lock()
+
+    # === DECISIONS ===
+    def backoff(self, attempt, response=None):
+        """Full-jitter delay before retry number `attempt` (1-based); honours Retry-After."""
+        delay = self._rng.uniform(0, min(self.retry_cap, self.retry_base * 2 ** (attempt - 1)))
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(self.retry_cap, float(retry_after)))
+            except ValueError:
+                pass
+        return delay
+
+    def failed(self, response):
+        return response.status_code in RETRY_STATUSES
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging this call, or None to not hedge."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES or self._hedge_count >= self._calls * self.hedge_max_ratio:
+                return None
+            ordered = sorted(self._latencies)
+        rank = max(1, math.ceil(self.hedge_percentile / 100.0 * len(ordered)))
+        return max(HEDGE_MIN_DELAY, ordered[rank - 1])
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            metrics.OCR_CIRCUIT_REJECTED.inc()
+            raise CircuitOpenError(self.breaker.retry_after())
+
+    def _record(self, response, seconds):
+        if self.failed(response):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            with self._lock:
+                self._latencies.append(seconds)
+
+    def _may_hedge(self):
+        # A hedge is a second request the breaker never approved: none while
+        # half-open (the primary is the single trial) or once it has opened
+        return self.breaker.state == CLOSED
+
+    def _count_call(self, hedged=False):
+        with self._lock:
+            if hedged:
+                self._hedge_count += 1
+            else:
+                self._calls += 1
+
+    def _retry_reason(self, response, error):
+        return type(error).__name__ if error is not None else str(response.status_code)
+
+    # === ASYNC ===
+    async def _attempt_async(self, send, retry_on, hedged=False):
+        """One timed request; returns (response, error)."""
+        self._count_call(hedged)
+        start = time.perf_counter()
+        try:
+            response = await send()
+        except retry_on as e:
+            self.breaker.record_failure()
+            return None, e
+        except BaseException:
+            self.breaker.release()
+            raise
+        self._record(response, time.perf_counter() - start)
+        return response, None
+
+    async def _hedged_async(self, send, retry_on, delay):
+        primary = asyncio.ensure_future(self._attempt_async(send, retry_on))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            if not self._may_hedge():
+                return await primary
+
+            hedge = asyncio.ensure_future(self._attempt_async(send, retry_on, hedged=True))
+            pending.add(hedge)
+            outcome = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response, error = task.result()
+                    outcome = outcome or (response, error)
+                    if error is None and not self.failed(response):
+                        metrics.OCR_HEDGES.inc(winner="hedge" if task is hedge else "primary")
+                        return response, None
+            return outcome
+        finally:
+            # The slower copy (or both, if the caller went away) is abandoned
+            for task in pending:
+                task.cancel()
+
+    async def call_async(self, send, retry_on=(), hedgeable=True):
+        for attempt in range(1, self.max_attempts + 1):
+            self._check_breaker()
+            delay = self.hedge_delay() if hedgeable else None
+            if delay is None:
+                response, error = await self._attempt_async(send, retry_on)
+            else:
+                response, error = await self._hedged_async(send, retry_on, delay)
+
+            if error is None and not self.failed(response):
+                return response
+            if attempt == self.max_attempts:
+                if error is not None:
+                    raise error
+                return response
+            metrics.OCR_RETRIES.inc(reason=self._retry_reason(response, error))
+            wait_for = self.backoff(attempt, response)
+            logger.warning("Nanonets attempt %d failed (%s), retrying in %.2fs", attempt,
+                           self._retry_reason(response, error), wait_for)
+            await asyncio.sleep(wait_for)
+
+    # === THREADED ===
+    def _attempt(self, send, retry_on, hedged=False):
+        self._count_call(hedged)
+        start = time.perf_counter()
+        try:
+            response = send()
+        except retry_on as e:
+            self.breaker.record_failure()
+            return None, e
+        except BaseException:
+            self.breaker.release()
+            raise
+        self._record(response, time.perf_counter() - start)
+        return response, None
+
+    def _hedged(self, send, retry_on, delay):
+        # Blocking requests cannot be cancelled; the loser finishes in the background
+        primary = _hedge_pool.submit(self._attempt, send, retry_on)
+        done, _ = wait({primary}, timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = _hedge_pool.submit(self._attempt, send, retry_on, True)
+        pending = {primary, hedge}
+        outcome = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                response, error = future.result()
+                outcome = outcome or (response, error)
+                if error is None and not self.failed(response):
+                    metrics.OCR_HEDGES.inc(winner="hedge" if future is hedge else "primary")
+                    return response, None
+        return outcome
+
+    def call(self, send, retry_on=(), hedgeable=True, wait_when_open=False):
+        """
+        Threaded call(). With wait_when_open, an open circuit holds the
+        caller until the next trial instead of failing (batch mode queues).
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            while True:
+                try:
+                    self._check_breaker()
+                    break
+                except CircuitOpenError as e:
+                    if not wait_when_open:
+                        raise
+                    time.sleep(max(e.retry_after, 0.5))
+            delay = self.hedge_delay() if hedgeable else None
+            if delay is None:
+                response, error = self._attempt(send, retry_on)
+            else:
+                response, error = self._hedged(send, retry_on, delay)
+
+            if error is None and not self.failed(response):
+                return response
+            if attempt == self.max_attempts:
+                if error is not None:
+                    raise error
+                return response
+            metrics.OCR_RETRIES.inc(reason=self._retry_reason(response, error))
+            wait_for = self.backoff(attempt, response)
+            logger.warning("Nanonets attempt %d failed (%s), retrying in %.2fs", attempt,
+                           self._retry_reason(response, error), wait_for)
+            time.sleep(wait_for)
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ocr-hedge")
+
+# One policy (and breaker) per process, shared by every caller
+policy = Policy()
@@ -0,0 +1,96 @@
+import importlib
+import logging
+import threading
+
+import keys_index
+import spec_engine
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Supplier parsers, named "<product>_<company>" exactly like the keywords
+# extracted from the Nanonets content (see extract_keywords).
+PARSER_MODULES = [
+    "Whey_Mahaan",
+    "Whey_Calpro",
+    "Whey_CalproSpecialities",
+    "Lecithin_ADM",
+    "LECITHIN_Kriti",
+    "OPTILEC_Kriti",
+]
+
+_parsers = {}
+_loaded = False
+_load_lock = threading.Lock()
+
+def load_parsers():
+    """
+    Import every supplier parser once and register it by name, then compile
+    their specs and keys indexes. Safe to call more than once; already loaded
+    parsers are kept. The API leaves this to the first lookup (_registry) so
+    cold starts do not pay for it.
+    """
+    global _loaded
+    with _load_lock:
+        for name in PARSER_MODULES:
+            if name in _parsers:
+                continue
+            try:
+                module = importlib.import_module(name)
+            except Exception as e:
+                logger.error("Failed to load parser %s: %s", name, e)
+                continue
+            _parsers[name] = module
+        logger.info("Loaded parsers: %s", sorted(_parsers))
+        validate_specs()
+        for keys_file in sorted({module.keys_file for module in _parsers.values()}):
+            keys_index.load(keys_file)
+        _loaded = True
+    return _parsers
+
+def _registry():
+    """The loaded parsers; the first call loads them."""
+    if not _loaded:
+        load_parsers()
+    return _parsers
+
+def validate_specs():
+    """Compile every parser's spec file now and report problems up front."""
+    problems = []
+    for name, module in _parsers.items():
+        for problem in spec_engine.validate(module.specs_file, module.parse_interval):
+            problems.append(problem)
+            logger.warning("%s: %s", name, problem)
+    return problems
+
+def get_parser(product_key, company_key):
+    """Return the parser module for a product/company keyword pair, or None."""
+    if not product_key or not company_key:
+        return None
+    return _registry().get(f"{product_key}_{company_key}")
+
+def run_parser(product_key, company_key, json_path):
+    """
+    Evaluate a saved Nanonets JSON file in-process.
+    Returns the parser's structured result, or None when no parser matches.
+    """
+    parser = get_parser(product_key, company_key)
+    if parser is None:
+        return None
+    return parser.run(json_path)
+
+def extract_keywords(name):
+    """First significant word of a product/company name (the API's rule)."""
+    if not name:
+        return None
+    ignore_words = {"non", "gmo", "soya", "powder", "permeate", "milk", "optilec", "optileec"}
+    words = [w for w in name.split() if w.lower() not in ignore_words]
+    if not words:
+        return None
+    return words[0].strip()
+
+def detect_parser(content):
+    """Parser module for a document's product/company fields, or None."""
+    product_name = content.get("product_name") or content.get("product") or ""
+    company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
+    return get_parser(extract_keywords(product_name), extract_keywords(company_name))
@@ -0,0 +1,108 @@
+import logging
+import os
+import tempfile
+import time
+
+import metrics
+
+# PyMuPDF is optional; without it the stage is skipped and PDFs go out as-is.
+# Imported on first use (see local_extract).
+_pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+ENABLED = os.environ.get("PDF_SHRINK", "0") == "1"
+# Embedded images above DPI_THRESHOLD are resampled down to TARGET_DPI
+TARGET_DPI = int(os.environ.get("PDF_SHRINK_DPI", "150"))
+DPI_THRESHOLD = int(os.environ.get("PDF_SHRINK_DPI_THRESHOLD", str(TARGET_DPI + 50)))
+JPEG_QUALITY = int(os.environ.get("PDF_SHRINK_QUALITY", "75"))
+# The shrunk copy is only sent when it is at least this fraction smaller
+MIN_SAVING = float(os.environ.get("PDF_SHRINK_MIN_SAVING", "0.05"))
+SHRINK_DIR = os.environ.get("PDF_SHRINK_DIR", os.path.join(tempfile.gettempdir(), "pdf_shrink"))
+
+def _load_pymupdf():
+    """The pymupdf module, imported on first use; False when not installed."""
+    global _pymupdf
+    if _pymupdf is None:
+        try:
+            import pymupdf
+        except ImportError:
+            pymupdf = False
+        _pymupdf = pymupdf
+    return _pymupdf
+
+def available():
+    return bool(_load_pymupdf())
+
+def _rewrite(src_path, dst_path, target_dpi, threshold_dpi, quality):
+    doc = _load_pymupdf().open(src_path)
+    try:
+        doc.rewrite_images(dpi_threshold=threshold_dpi, dpi_target=target_dpi, quality=quality)
+        # garbage=4 drops unused and duplicate objects; the rest recompresses streams
+        doc.save(dst_path, garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=1)
+    finally:
+        doc.close()
+
+def shrink(src_path, target_dpi=TARGET_DPI, threshold_dpi=DPI_THRESHOLD, quality=JPEG_QUALITY, min_saving=MIN_SAVING):
+    """
+    Downsample embedded images, drop unused objects and re-encode one PDF.
+    Returns {"path", "applied", "reason", "original_bytes", "bytes",
+    "saved_bytes", "seconds"}. "path" is the file to send: a new temp file
+    when applied (the caller removes it with discard()), else src_path.
+    """
+    start = time.perf_counter()
+    original = os.path.getsize(src_path)
+    result = {"path": src_path, "applied": False, "reason": "", "original_bytes": original,
+              "bytes": original, "saved_bytes": 0, "seconds": 0.0}
+
+    if not available():
+        result["reason"] = "PyMuPDF not installed"
+        return result
+
+    os.makedirs(SHRINK_DIR, exist_ok=True)
+    fd, dst_path = tempfile.mkstemp(suffix=".pdf", dir=SHRINK_DIR)
+    os.close(fd)
+    try:
+        _rewrite(src_path, dst_path, target_dpi, threshold_dpi, quality)
+        size = os.path.getsize(dst_path)
+    except Exception as e:
+        _remove(dst_path)
+        result["reason"] = f"shrink failed: {e}"
+        result["seconds"] = time.perf_counter() - start
+        metrics.PDF_SHRINK.observe(result["seconds"], outcome="error")
+        logger.warning("PDF shrink failed for %s: %s", os.path.basename(src_path), e)
+        return result
+
+    result["seconds"] = time.perf_counter() - start
+    if size > original * (1 - min_saving):
+        _remove(dst_path)
+        result["reason"] = "saving below threshold"
+        metrics.PDF_SHRINK.observe(result["seconds"], outcome="skipped")
+        return result
+
+    result.update(path=dst_path, applied=True, bytes=size, saved_bytes=original - size)
+    metrics.PDF_SHRINK.observe(result["seconds"], outcome="applied")
+    metrics.PDF_SHRINK_SAVED.inc(original - size)
+    logger.info("PDF shrunk %d -> %d bytes in %.2fs", original, size, result["seconds"],
+                extra={"saved_bytes": original - size})
+    return result
+
+def maybe_shrink(src_path):
+    """shrink() when PDF_SHRINK=1, otherwise a pass-through result."""
+    if not ENABLED:
+        size = os.path.getsize(src_path)
+        return {"path": src_path, "applied": False, "reason": "disabled", "original_bytes": size,
+                "bytes": size, "saved_bytes": 0, "seconds": 0.0}
+    return shrink(src_path)
+
+def discard(result):
+    """Remove the shrunk copy, if one was made."""
+    if result["applied"]:
+        _remove(result["path"])
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,222 @@
+import heapq
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# watchdog is optional; without it the folder is rescanned every POLL_INTERVAL
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# A PDF is handed to a worker once it has been quiet (no writes) this long,
+# or at once when the writer closes it (inotify IN_CLOSE_WRITE)
+DEBOUNCE = float(os.environ.get("WATCH_DEBOUNCE", "0.5"))
+POLL_INTERVAL = float(os.environ.get("WATCH_POLL_INTERVAL", "1.0"))
+PROCESSED_DIRNAME = "processed"
+FAILED_DIRNAME = "failed"
+
+def available():
+    return Observer is not None
+
+def _is_pdf(path):
+    return path.lower().endswith(".pdf")
+
+def archive(path, target_dir):
+    """Move a handled PDF into target_dir, timestamping the name on a clash."""
+    os.makedirs(target_dir, exist_ok=True)
+    name = os.path.basename(path)
+    target = os.path.join(target_dir, name)
+    if os.path.exists(target):
+        stem, ext = os.path.splitext(name)
+        target = os.path.join(target_dir, f"{stem}_{time.strftime('%Y%m%d_%H%M%S')}{ext}")
+    shutil.move(path, target)
+    logger.info("Moved %s to %s/", name, os.path.basename(target_dir))
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        # Uploaders that write a temp name and rename are complete on arrival
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path, ready=True)
+
+    def on_opened(self, event):
+        if not event.is_directory:
+            self.watcher.opened(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.watcher.closed(event.src_path)
+            self.watcher.notify(event.src_path, ready=True)
+
+    def on_closed_no_write(self, event):
+        if not event.is_directory:
+            self.watcher.closed(event.src_path)
+
+class PdfWatcher:
+    """
+    Hand every PDF that lands in `directory` to `handle(path) -> bool` on a
+    pool of `workers` threads, then move it to processed/ (or failed/ when
+    handle returned False), so each file is processed once.
+    Filesystem events come from watchdog (inotify on Linux); partial writes
+    are held while the file is open and debounced until it is closed or has
+    been quiet for `debounce` (platforms without open/close events).
+    """
+    def __init__(self, directory, handle, workers=1, debounce=DEBOUNCE):
+        self.directory = os.path.abspath(directory)
+        self.handle = handle
+        self.debounce = debounce
+        self.processed_dir = os.path.join(self.directory, PROCESSED_DIRNAME)
+        self.failed_dir = os.path.join(self.directory, FAILED_DIRNAME)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pdf-watch")
+        self._lock = threading.Condition()
+        self._due = []          # heap of (due time, path)
+        self._deadline = {}     # path -> (latest due time, closed by its writer)
+        self._in_flight = set()
+        self._open = {}         # path -> open handles seen through events
+        self._stopping = False
+        self._observer = None
+        self._scheduler = None
+
+    # === EVENTS ===
+    def notify(self, path, ready=False):
+        """A PDF was written, closed or moved in; (re)schedule it."""
+        path = os.path.abspath(path)
+        if not _is_pdf(path) or os.path.dirname(path) != self.directory:
+            return
+        due = time.monotonic() + (0 if ready else self.debounce)
+        with self._lock:
+            if path in self._in_flight:
+                return
+            self._deadline[path] = (due, ready)
+            heapq.heappush(self._due, (due, path))
+            self._lock.notify()
+
+    def opened(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._open[path] = self._open.get(path, 0) + 1
+
+    def closed(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._open.pop(path, 0) - 1
+            if count > 0:
+                self._open[path] = count
+
+    def _scan(self):
+        for name in os.listdir(self.directory):
+            if _is_pdf(name):
+                self.notify(os.path.join(self.directory, name))
+
+    def _next_due(self):
+        """
+        Block until a scheduled PDF is due; returns (path, ready), or None
+        when stopping.
+        """
+        with self._lock:
+            while not self._stopping:
+                now = time.monotonic()
+                while self._due and self._due[0][0] <= now:
+                    due, path = heapq.heappop(self._due)
+                    # A later event pushed this file back; that entry will fire instead
+                    if self._deadline.get(path, (None,))[0] != due:
+                        continue
+                    _, ready = self._deadline.pop(path)
+                    # Still open for writing: its close event reschedules it
+                    if not ready and self._open.get(path):
+                        continue
+                    self._in_flight.add(path)
+                    return path, ready
+                timeout = self._due[0][0] - now if self._due else None
+                if self._observer is None:
+                    timeout = POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL)
+                if not self._lock.wait(timeout) and self._observer is None and not self._due:
+                    self._lock.release()
+                    try:
+                        self._scan()
+                    finally:
+                        self._lock.acquire()
+        return None
+
+    def _schedule_loop(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            path, ready = due
+            try:
+                quiet_for = time.time() - os.stat(path).st_mtime
+            except FileNotFoundError:
+                self._done(path)
+                continue
+            if not ready and 0 <= quiet_for < self.debounce:
+                # Still being written (e.g. a copy without close events yet)
+                self._done(path)
+                self.notify(path)
+                continue
+            self._pool.submit(self._process, path)
+
+    # === PROCESSING ===
+    def _process(self, path):
+        try:
+            ok = self.handle(path)
+        except Exception as e:
+            logger.exception("Watch handler failed for %s: %s", os.path.basename(path), e)
+            ok = False
+        try:
+            archive(path, self.processed_dir if ok else self.failed_dir)
+        except OSError as e:
+            logger.error("Could not move %s out of the watch folder: %s", os.path.basename(path), e)
+        finally:
+            self._done(path)
+
+    def _done(self, path):
+        with self._lock:
+            self._in_flight.discard(path)
+
+    # === LIFECYCLE ===
+    def start(self):
+        """Start watching; PDFs already in the folder are processed first."""
+        os.makedirs(self.directory, exist_ok=True)
+        if available():
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.directory, recursive=False)
+            self._observer.start()
+        else:
+            logger.warning("watchdog is not installed; polling %s every %.1fs instead", self.directory, POLL_INTERVAL)
+        self._scheduler = threading.Thread(target=self._schedule_loop, name="pdf-watch-scheduler", daemon=True)
+        self._scheduler.start()
+        self._scan()
+        logger.info("Watching %s", self.directory, extra={"events": "watchdog" if available() else "polling"})
+
+    def stop(self):
+        """Stop taking new files and wait for the ones in progress."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+        if self._scheduler is not None:
+            self._scheduler.join()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+import applog
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Stage events of the document being processed, published under its
+# correlation id (applog request id) and streamed to GET /progress/{id}
+# listeners. Without a listener publish() is one dict lookup.
+QUEUE_SIZE = int(os.environ.get("PROGRESS_QUEUE_SIZE", "1000"))
+KEEPALIVE = float(os.environ.get("PROGRESS_KEEPALIVE", "15"))
+
+# The stream ends after one of these
+FINAL_STAGES = {"done", "failed", "queued"}
+
+_subscribers = {}   # channel -> set of (event loop, asyncio.Queue)
+_lock = threading.Lock()
+
+# === PUBLISH ===
+def listening(channel=None):
+    """True when someone follows channel (default: the current request)."""
+    return (channel or applog.get_request_id()) in _subscribers
+
+def publish(stage, channel=None, **fields):
+    """
+    Send one stage event to the listeners of channel (default: the current
+    request). Safe from worker threads; a listener that falls QUEUE_SIZE
+    events behind loses the newest ones rather than slowing the pipeline.
+    """
+    subscribers = _subscribers.get(channel or applog.get_request_id())
+    if not subscribers:
+        return
+    event = {"stage": stage, "ts": time.time(), **fields}
+    for loop, queue in list(subscribers):
+        try:
+            loop.call_soon_threadsafe(_offer, queue, event)
+        except RuntimeError:
+            # The listener's loop has closed; its subscribe() block cleans up
+            pass
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        logger.warning("Progress listener is behind; dropped %s event", event["stage"])
+
+# === SUBSCRIBE ===
+@contextlib.contextmanager
+def subscribe(channel):
+    """Follow channel for the with-block; yields the asyncio.Queue events arrive on."""
+    entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+    with _lock:
+        _subscribers.setdefault(channel, set()).add(entry)
+    try:
+        yield entry[1]
+    finally:
+        with _lock:
+            subscribers = _subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del _subscribers[channel]
+
+def format_sse(event):
+    """One Server-Sent Events message; the stage doubles as the SSE event name."""
+    return f"event: {event['stage']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from content_index import normalize
+from parser_registry import extract_keywords
+
+# === CONFIG ===
+# Every processed COA (OCR content, per-parameter outcome, timings) is kept in
+# one SQLite file so past results stay queryable after retention removes the
+# output files.
+RESULTS_DB = os.environ.get("RESULTS_DB", os.path.join(tempfile.gettempdir(), "results.sqlite3"))
+QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
+COMPLIANT, NON_COMPLIANT, UNPARSED = "compliant", "non_compliant", "unparsed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS coas (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    pdf_digest TEXT,
+    parser TEXT,
+    product_name TEXT,
+    company_name TEXT,
+    product TEXT,
+    supplier TEXT,
+    batch_number TEXT,
+    coa_date TEXT,
+    status TEXT NOT NULL,
+    ocr_backend TEXT,
+    processed_at REAL NOT NULL,
+    timings TEXT,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    coa_id TEXT NOT NULL REFERENCES coas (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    parameter TEXT NOT NULL,
+    param TEXT NOT NULL,
+    result TEXT,
+    spec TEXT,
+    status TEXT,
+    reason TEXT,
+    within_spec INTEGER NOT NULL,
+    compliance_key INTEGER NOT NULL,
+    PRIMARY KEY (coa_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS coas_supplier ON coas (supplier, product, coa_date);
+CREATE INDEX IF NOT EXISTS coas_product ON coas (product, coa_date);
+CREATE INDEX IF NOT EXISTS coas_batch ON coas (batch_number);
+CREATE INDEX IF NOT EXISTS coas_date ON coas (coa_date);
+CREATE INDEX IF NOT EXISTS coas_digest ON coas (pdf_digest);
+CREATE INDEX IF NOT EXISTS params_param ON params (param, within_spec, coa_id);
+"""
+
+# Fields Nanonets uses for the identifying header of a COA, in preference order
+BATCH_FIELDS = ["batch_number", "batch_no", "lot_number", "lot_no", "batch", "lot"]
+DATE_FIELDS = ["date_of_manufacturing", "manufacturing_date", "document_date", "date_of_analysis", "date"]
+DATE_FORMATS = ["%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d", "%d %b %Y", "%d %B %Y", "%d-%b-%Y", "%b %d %Y", "%B %d %Y", "%d-%m-%y", "%d/%m/%y"]
+
+# Databases whose schema this process has created; the first connection to
+# any other creates it, so hosts that never run startup hooks still work
+_ready = set()
+_ready_lock = threading.Lock()
+
+def _open():
+    conn = sqlite3.connect(RESULTS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+def _connect():
+    if RESULTS_DB not in _ready:
+        init()
+    return _open()
+
+def init():
+    """Create the tables and indexes if needed."""
+    with _ready_lock:
+        os.makedirs(os.path.dirname(RESULTS_DB) or ".", exist_ok=True)
+        with _open() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        _ready.add(RESULTS_DB)
+
+# === FIELDS ===
+def parse_date(value):
+    """ISO date (YYYY-MM-DD) from the date formats COAs use, or None."""
+    if not value:
+        return None
+    text = re.sub(r"[.,](?=\s)|\.$", "", str(value).strip())
+    text = re.sub(r"\s+", " ", text)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def _first(content, fields):
+    for field in fields:
+        if content.get(field):
+            return str(content[field]).strip()
+    return None
+
+def _coa_date(content):
+    for field in DATE_FIELDS:
+        parsed = parse_date(content.get(field))
+        if parsed:
+            return parsed
+    return None
+
+def _key(name):
+    keyword = extract_keywords(name)
+    return keyword.lower() if keyword else None
+
+# === STORE ===
+def record(filename, pdf_digest, content, parser_name=None, evaluation=None, timings=None, ocr_backend=None):
+    """
+    Persist one processed COA and its per-parameter outcome; returns its id.
+    evaluation is the parser's result (None when no parser matched).
+    """
+    content = content or {}
+    product_name = content.get("product_name") or content.get("product") or ""
+    company_name = content.get("company_name") or content.get("supplier") or content.get("manufacturing_vendor_site_name") or ""
+    if evaluation is None:
+        status = UNPARSED
+    else:
+        status = NON_COMPLIANT if evaluation.get("non_compliant") else COMPLIANT
+
+    coa_id = uuid.uuid4().hex
+    rows = (evaluation or {}).get("rows", [])
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO coas (id, filename, pdf_digest, parser, product_name, company_name, product, supplier, "
+            "batch_number, coa_date, status, ocr_backend, processed_at, timings, content) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (coa_id, filename, pdf_digest, parser_name, product_name, company_name, _key(product_name),
+             _key(company_name), _first(content, BATCH_FIELDS), _coa_date(content), status, ocr_backend,
+             time.time(), json.dumps(timings or {}), json.dumps(content, ensure_ascii=False)),
+        )
+        conn.executemany(
+            "INSERT INTO params (coa_id, position, parameter, param, result, spec, status, reason, within_spec, compliance_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(coa_id, i, row["parameter"], normalize(row["parameter"]), row.get("result"), row.get("spec"),
+              row.get("status"), row.get("reason"), int(bool(row.get("within_spec"))), int(bool(row.get("compliance_key"))))
+             for i, row in enumerate(rows)],
+        )
+    return coa_id
+
+# === QUERIES ===
+def _summary(row):
+    coa = dict(row)
+    coa["timings"] = json.loads(coa["timings"]) if coa["timings"] else {}
+    return coa
+
+def query(supplier=None, product=None, batch=None, parameter=None, failing=None, status=None,
+          since=None, until=None, limit=QUERY_LIMIT, offset=0):
+    """
+    COAs matching every given filter, newest COA date first.
+    supplier/product match the dispatch keywords ("Mahaan", "Whey");
+    parameter with failing=True keeps COAs where that parameter is out of
+    spec (or missing), failing=False where it passed. since/until are
+    inclusive ISO dates on the COA's own date. Matching parameter rows are
+    returned under "params" when parameter is given.
+    """
+    where, args = [], []
+    if supplier:
+        where.append("c.supplier = ?")
+        args.append(supplier.lower())
+    if product:
+        where.append("c.product = ?")
+        args.append(product.lower())
+    if batch:
+        where.append("c.batch_number = ?")
+        args.append(batch)
+    if status:
+        where.append("c.status = ?")
+        args.append(status)
+    if since:
+        where.append("c.coa_date >= ?")
+        args.append(since)
+    if until:
+        where.append("c.coa_date <= ?")
+        args.append(until)
+    if parameter:
+        param_filter = "p.param = ?"
+        param_args = [normalize(parameter)]
+        if failing is not None:
+            param_filter += " AND p.within_spec = ?"
+            param_args.append(0 if failing else 1)
+        where.append(f"c.id IN (SELECT p.coa_id FROM params p WHERE {param_filter})")
+        args.extend(param_args)
+
+    sql = ("SELECT c.id, c.filename, c.parser, c.product_name, c.company_name, c.batch_number, c.coa_date, "
+           "c.status, c.ocr_backend, c.processed_at, c.timings FROM coas c")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY c.coa_date DESC, c.processed_at DESC LIMIT ? OFFSET ?"
+    args.extend([max(1, min(int(limit), MAX_QUERY_LIMIT)), max(0, int(offset))])
+
+    with _connect() as conn:
+        coas = [_summary(row) for row in conn.execute(sql, args)]
+        if parameter and coas:
+            ids = [coa["id"] for coa in coas]
+            placeholders = ",".join("?" * len(ids))
+            matched = {}
+            for row in conn.execute(
+                f"SELECT * FROM params WHERE param = ? AND coa_id IN ({placeholders}) ORDER BY position",
+                [normalize(parameter)] + ids,
+            ):
+                matched.setdefault(row["coa_id"], []).append(_param(row))
+            for coa in coas:
+                coa["params"] = matched.get(coa["id"], [])
+    return coas
+
+def _param(row):
+    param = dict(row)
+    del param["coa_id"], param["param"]
+    param["within_spec"] = bool(param["within_spec"])
+    param["compliance_key"] = bool(param["compliance_key"])
+    return param
+
+def get(coa_id):
+    """One stored COA with its OCR content and every parameter row, or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM coas WHERE id = ?", (coa_id,)).fetchone()
+        if row is None:
+            return None
+        coa = _summary(row)
+        coa["content"] = json.loads(coa["content"]) if coa["content"] else {}
+        coa["params"] = [_param(p) for p in conn.execute("SELECT * FROM params WHERE coa_id = ? ORDER BY position", (coa_id,))]
+    return coa
@@ -0,0 +1,161 @@
+import collections
+import contextlib
+import fnmatch
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# Each managed directory is bounded by age and total size; sweeps remove
+# expired files first, then least-recently-used ones until under the size
+# limit. Files in use (protect()) or touched within MIN_AGE are never removed,
+# which also covers files another process is still writing or reading.
+CURRENT_DIR = os.getcwd()
+INTERVAL = float(os.environ.get("RETENTION_INTERVAL", "300"))
+MIN_AGE = float(os.environ.get("RETENTION_MIN_AGE", "300"))
+
+MB = 1024 * 1024
+DAY = 24 * 3600
+
+DIRECTORIES = {}
+
+def register(name, path, max_bytes, max_age, files=("*",)):
+    """
+    Manage path under name. files are glob patterns relative to path (so
+    "processed/*" leaves the top level alone); limits can be overridden with
+    RETENTION_<NAME>_MAX_BYTES and RETENTION_<NAME>_MAX_AGE (seconds).
+    """
+    DIRECTORIES[name] = {
+        "path": os.path.abspath(path),
+        "max_bytes": int(os.environ.get(f"RETENTION_{name.upper()}_MAX_BYTES", max_bytes)),
+        "max_age": float(os.environ.get(f"RETENTION_{name.upper()}_MAX_AGE", max_age)),
+        "files": tuple(files),
+    }
+
+# PDFs waiting in pdf/ are inputs; only the ones already processed are retained
+register("pdf", os.path.join(CURRENT_DIR, "pdf"), 1024 * MB, 30 * DAY, files=("processed/*", "failed/*"))
+# CLI JSON and reports, and the API's per-request JSON and reports (backend_api.JSON_DIR)
+register("output", os.path.join(CURRENT_DIR, "output"), 500 * MB, 7 * DAY)
+register("json", os.path.join(tempfile.gettempdir(), "output"), 500 * MB, DAY)
+
+# === IN-FLIGHT FILES ===
+_in_use = collections.Counter()
+_lock = threading.Lock()
+
+def _stem(path):
+    return os.path.splitext(os.path.abspath(path))[0]
+
+@contextlib.contextmanager
+def protect(*paths):
+    """
+    Keep paths out of sweeps for the with-block. Files derived from a
+    protected file (its "<name>_..._report.html" reports) are kept too.
+    """
+    stems = [_stem(p) for p in paths if p]
+    with _lock:
+        _in_use.update(stems)
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_use.subtract(stems)
+            for stem in stems:
+                if _in_use[stem] <= 0:
+                    del _in_use[stem]
+
+def _protected(path):
+    stem = os.path.splitext(path)[0]
+    with _lock:
+        return any(stem == used or path.startswith(used + "_") for used in _in_use)
+
+# === SWEEP ===
+def _files(directory):
+    """(last use, size, path) of every managed file; last use is max(atime, mtime)."""
+    entries = []
+    for root, _, names in os.walk(directory["path"]):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory["path"])
+            if not any(fnmatch.fnmatch(relative, pattern) for pattern in directory["files"]):
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+    return entries
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning("Could not remove %s: %s", path, e)
+        return False
+
+def sweep(name, now=None):
+    """
+    Apply one directory's limits; returns what is left and what was removed.
+    Size eviction stops short of the limit when only protected files remain.
+    """
+    directory = DIRECTORIES[name]
+    now = time.time() if now is None else now
+    kept, removed, freed = [], 0, 0
+    for used, size, path in _files(directory):
+        if now - used < MIN_AGE or _protected(path):
+            kept.append((float("inf"), size, path))
+        elif now - used > directory["max_age"]:
+            if _remove(path):
+                removed, freed = removed + 1, freed + size
+                metrics.RETENTION_REMOVED.inc(directory=name, reason="age")
+        else:
+            kept.append((used, size, path))
+
+    total, files = sum(size for _, size, _ in kept), len(kept)
+    for used, size, path in sorted(kept):
+        if total <= directory["max_bytes"] or used == float("inf"):
+            break
+        if _remove(path):
+            removed, freed = removed + 1, freed + size
+            total, files = total - size, files - 1
+            metrics.RETENTION_REMOVED.inc(directory=name, reason="size")
+
+    metrics.DISK_BYTES.set(total, directory=name)
+    metrics.DISK_FILES.set(files, directory=name)
+    if freed:
+        metrics.RETENTION_FREED.inc(freed, directory=name)
+    if total > directory["max_bytes"]:
+        logger.warning("%s holds %d bytes of files in use, over its %d byte limit", name, total, directory["max_bytes"])
+    return {"directory": name, "files": files, "bytes": total, "removed": removed, "freed": freed}
+
+def sweep_all():
+    """Sweep every managed directory that exists; returns one summary per directory."""
+    summaries, swept = [], set()
+    with metrics.RETENTION_SWEEP.time():
+        for name, directory in DIRECTORIES.items():
+            # Run from the temp dir, output/ and the API's JSON_DIR are the same
+            if directory["path"] in swept or not os.path.isdir(directory["path"]):
+                continue
+            swept.add(directory["path"])
+            summary = sweep(name)
+            summaries.append(summary)
+            if summary["removed"]:
+                logger.info("Retention removed %d files (%d bytes) from %s", summary["removed"], summary["freed"], name,
+                            extra={"directory": name, "files": summary["files"], "bytes": summary["bytes"]})
+    return summaries
+
+if __name__ == "__main__":
+    import applog
+
+    applog.setup()
+    for summary in sweep_all():
+        print(f"[RETENTION] {summary['directory']:<8} removed {summary['removed']} files ({summary['freed']} bytes), "
+              f"{summary['files']} files ({summary['bytes']} bytes) kept")
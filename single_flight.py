@@ -0,0 +1,118 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+
+import metrics
+import ocr_cache
+
+# Cross-process locks need fcntl; elsewhere only in-process coalescing applies
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+# One lock file per OCR cache key, shared by every API worker and CLI run on
+# the host. Lock files are tiny and reused, never deleted while in use.
+LOCK_DIR = os.environ.get("SINGLE_FLIGHT_DIR", os.path.join(ocr_cache.CACHE_DIR, "locks"))
+# Give up waiting on another process after this long and do the work anyway
+LOCK_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", "180"))
+POLL_INTERVAL = 0.05
+
+# === IN-PROCESS ===
+class Group:
+    """
+    Coalesce concurrent calls with the same key inside one event loop: the
+    first caller runs the coroutine, later callers await the same result
+    (or exception) instead of starting their own.
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args):
+        """Returns (result, shared); shared is True for callers that joined."""
+        call = self._calls.get(key)
+        if call is not None:
+            return await asyncio.shield(call), True
+
+        call = asyncio.ensure_future(fn(*args))
+        self._calls[key] = call
+        call.add_done_callback(lambda _: self._finished(key, call))
+        # Shielded on both sides: a caller going away (leader included) only
+        # stops its own wait, the work finishes for everyone else
+        return await asyncio.shield(call), False
+
+    def _finished(self, key, call):
+        self._calls.pop(key, None)
+        # Nobody may be awaiting it any more; retrieve the error so it is not reported as lost
+        if not call.cancelled() and call.exception() is not None:
+            logger.debug("Coalesced call %s failed: %s", key, call.exception())
+
+    def pending(self, key):
+        """The running call for key (an asyncio future), or None."""
+        return self._calls.get(key)
+
+    def in_flight(self):
+        return len(self._calls)
+
+# === CROSS-PROCESS ===
+def _lock_path(key):
+    return os.path.join(LOCK_DIR, f"{key}.lock")
+
+def _try_lock(f):
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+@contextlib.contextmanager
+def file_lock(key):
+    """
+    Hold the host-wide lock for key (blocking). Yields True when another
+    process held it first, so the caller should re-check the OCR cache.
+    """
+    if fcntl is None:
+        yield False
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(_lock_path(key), "a+b") as f:
+        waited = not _try_lock(f)
+        if waited:
+            started = time.perf_counter()
+            while not _try_lock(f):
+                if time.perf_counter() - started > LOCK_TIMEOUT:
+                    logger.warning("Gave up waiting for lock %s after %.0fs", key, LOCK_TIMEOUT)
+                    break
+                time.sleep(POLL_INTERVAL)
+            metrics.SINGLE_FLIGHT_WAIT.observe(time.perf_counter() - started, scope="host")
+        try:
+            yield waited
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextlib.asynccontextmanager
+async def file_lock_async(key):
+    """file_lock() for the event loop: waits with asyncio.sleep, never blocks."""
+    if fcntl is None:
+        yield False
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(_lock_path(key), "a+b") as f:
+        waited = not _try_lock(f)
+        if waited:
+            started = time.perf_counter()
+            while not _try_lock(f):
+                if time.perf_counter() - started > LOCK_TIMEOUT:
+                    logger.warning("Gave up waiting for lock %s after %.0fs", key, LOCK_TIMEOUT)
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+            metrics.SINGLE_FLIGHT_WAIT.observe(time.perf_counter() - started, scope="host")
+        try:
+            yield waited
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,91 @@
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# === SPEC CACHE ===
+# Compiled specs per (spec file, parse_interval function). Each parser keeps its
+# own parse_interval, so the same file may be compiled once per parser flavour.
+_cache = {}
+_lock = threading.Lock()
+
+def normalize_key(s):
+    return re.sub(r"[^a-z0-9]", "", str(s).lower()) if s else ""
+
+def compile_spec(raw, parse_interval):
+    """
+    Split a spec string into its OR alternatives and parse each one once.
+    Alternatives without a numeric interval are kept as textual rules.
+    """
+    is_or = " OR " in raw.upper()
+    parts = [p.strip() for p in re.split(r'\s+OR\s+', raw, flags=re.IGNORECASE)] if is_or else [raw]
+    alternatives = []
+    for part in parts:
+        interval = parse_interval(part, is_spec=True)
+        alternatives.append({"text": part, "interval": interval, "textual": interval is None})
+    return {"raw": raw, "or": is_or, "alternatives": alternatives}
+
+def _compile_file(path, parse_interval):
+    specs = {}
+    errors = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if "|" not in line:
+                errors.append(f"{os.path.basename(path)}:{line_no}: missing '|' separator: {line}")
+                continue
+            name, raw = line.split("|", 1)
+            key = normalize_key(name)
+            if key in specs:
+                errors.append(f"{os.path.basename(path)}:{line_no}: duplicate spec '{name.strip()}' overrides earlier value")
+            specs[key] = compile_spec(raw.strip(), parse_interval)
+    return specs, errors
+
+def load_specs(path, parse_interval):
+    """
+    Return {normalized parameter: compiled spec} for a spec file.
+    The file is compiled once and recompiled only when its mtime changes;
+    a missing file gives an empty dict, as before.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+
+    cache_key = (os.path.abspath(path), parse_interval)
+    cached = _cache.get(cache_key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _lock:
+        cached = _cache.get(cache_key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        specs, errors = _compile_file(path, parse_interval)
+        for error in errors:
+            logger.warning(error)
+        _cache[cache_key] = (mtime, specs)
+        return specs
+
+def validate(path, parse_interval):
+    """
+    Compile a spec file eagerly and return a list of problems found.
+    Used at startup so spec mistakes show up before the first upload.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return [f"spec file not found: {path}"]
+
+    specs, errors = _compile_file(path, parse_interval)
+    with _lock:
+        _cache[(os.path.abspath(path), parse_interval)] = (mtime, specs)
+
+    for key, spec in specs.items():
+        if all(alt["textual"] for alt in spec["alternatives"]):
+            errors.append(f"{os.path.basename(path)}: '{key}' has no numeric limit, only textual matching applies: {spec['raw']}")
+    return errors
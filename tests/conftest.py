@@ -0,0 +1,107 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+# Module-level config is read at import: keep caches, locks and databases out
+# of the shared temp dir, and retries fast
+_SCRATCH = tempfile.mkdtemp(prefix="pdf_ocr_tests_")
+os.environ.setdefault("OCR_CACHE_DIR", os.path.join(_SCRATCH, "ocr_cache"))
+os.environ.setdefault("JOBS_DB", os.path.join(_SCRATCH, "jobs.sqlite3"))
+os.environ.setdefault("RESULTS_DB", os.path.join(_SCRATCH, "results.sqlite3"))
+os.environ.setdefault("OCR_RETRY_BASE", "0.01")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import jobs  # noqa: E402
+import local_extract  # noqa: E402
+import ocr_cache  # noqa: E402
+import ocr_resilience  # noqa: E402
+import results_store  # noqa: E402
+
+COA_PDF = os.path.join(BASE_DIR, "docs", "3439 COA - 2030CE080412 - amol Kate.pdf")
+# A recorded response for every PDF the tests upload (see nanonets_stub.py)
+DEFAULT_RECORDING = "3439 COA - 2030CE080412 - amol Kate"
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_until_up(url, proc, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"nanonets_stub.py exited with status {proc.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("nanonets_stub.py did not start")
+
+@pytest.fixture
+def stub():
+    """
+    Start nanonets_stub.py with the given STUB_* settings; returns its
+    /extract URL. Unknown PDFs get DEFAULT_RECORDING.
+    """
+    procs = []
+
+    def start(**settings):
+        port = _free_port()
+        env = dict(os.environ, STUB_DEFAULT_RECORDING=DEFAULT_RECORDING,
+                   **{f"STUB_{k.upper()}": str(v) for k, v in settings.items()})
+        proc = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "nanonets_stub.py"), "--port", str(port)],
+                                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        procs.append(proc)
+        _wait_until_up(f"http://127.0.0.1:{port}/stats", proc)
+        return f"http://127.0.0.1:{port}/extract"
+
+    yield start
+    for proc in procs:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+@pytest.fixture
+def stub_stats():
+    """Request counters of a stub started with the stub fixture."""
+    def stats(url):
+        with urllib.request.urlopen(url.rsplit("/", 1)[0] + "/stats", timeout=5) as f:
+            return json.load(f)
+    return stats
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Fresh OCR cache, databases and Nanonets policy per test; no local text extraction."""
+    monkeypatch.setattr(ocr_cache, "CACHE_DIR", str(tmp_path / "ocr_cache"))
+    monkeypatch.setattr(jobs, "JOBS_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(results_store, "RESULTS_DB", str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(local_extract, "ENABLED", False)
+    monkeypatch.setattr(ocr_resilience, "policy", ocr_resilience.Policy(retry_base=0.01, hedge=False))
+    jobs.init()
+    results_store.init()
+    return tmp_path
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """backend_api writing under tmp_path; returns a helper pointing it at a stub."""
+    import backend_api
+    import ocr_client
+
+    monkeypatch.setattr(backend_api, "JSON_DIR", str(tmp_path / "json"))
+    # The pooled client is bound to the event loop that created it
+    monkeypatch.setattr(ocr_client, "_client", None)
+
+    def use(url):
+        monkeypatch.setattr(ocr_client, "NANONETS_URL", url)
+        return backend_api.app
+    return use
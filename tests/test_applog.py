@@ -0,0 +1,53 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+
+import applog
+
+def log_through_queue(fmt, emit):
+    """Log one record through applog's queue handler and listener; returns the written output."""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(applog.JsonFormatter() if fmt == "json" else logging.Formatter("%(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger = logging.getLogger(f"test_applog.{fmt}")
+    logger.propagate = False
+    queue_handler = applog._QueueHandler(log_queue)
+    queue_handler.addFilter(applog.ContextFilter())
+    logger.addHandler(queue_handler)
+    listener.start()
+    try:
+        emit(logger)
+    finally:
+        listener.stop()
+        logger.removeHandler(queue_handler)
+    return stream.getvalue()
+
+def failing(logger):
+    try:
+        raise ValueError("bad spec")
+    except ValueError:
+        logger.exception("Parser failed for %s", "coa.pdf")
+
+def test_json_traceback_is_its_own_field():
+    entry = json.loads(log_through_queue("json", failing))
+
+    assert entry["msg"] == "Parser failed for coa.pdf"
+    assert entry["exc"].startswith("Traceback")
+    assert "ValueError: bad spec" in entry["exc"]
+
+def test_text_format_keeps_the_traceback():
+    output = log_through_queue("text", failing)
+
+    assert output.startswith("Parser failed for coa.pdf\nTraceback")
+    assert "ValueError: bad spec" in output
+
+def test_extra_fields_and_request_id():
+    applog.new_request_id("req-1")
+    entry = json.loads(log_through_queue("json", lambda logger: logger.warning("slow", extra={"seconds": 2.5})))
+
+    assert (entry["msg"], entry["seconds"], entry["request_id"]) == ("slow", 2.5, "req-1")
+    assert "exc" not in entry
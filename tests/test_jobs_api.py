@@ -0,0 +1,35 @@
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from conftest import COA_PDF
+
+def submit(client):
+    with open(COA_PDF, "rb") as f:
+        return client.post("/jobs/", files={"file": (os.path.basename(COA_PDF), f, "application/pdf")})
+
+def wait_for_job(client, job_id, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+def test_job_runs_under_lifespan(stub, api):
+    with TestClient(api(stub())) as client:
+        response = submit(client)
+        assert response.status_code == 202
+        job = wait_for_job(client, response.json()["jobId"])
+
+    assert job["status"] == "done", job
+    assert job["result"]["success"] is True
+
+def test_jobs_refused_without_workers(stub, api):
+    # No lifespan events, so no job workers in this process
+    client = TestClient(api(stub()))
+
+    assert submit(client).status_code == 503
+    assert client.get("/jobs/0123456789abcdef").status_code == 503
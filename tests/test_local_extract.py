@@ -0,0 +1,39 @@
+import pytest
+
+import local_extract
+
+# PyMuPDF is optional (see local_extract)
+pymupdf = pytest.importorskip("pymupdf")
+
+@pytest.fixture
+def unknown_supplier_pdf(tmp_path):
+    """A digital COA, complete but from a supplier no parser knows."""
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((50, 72), "Product Name: Widget Concentrate")
+    page.insert_text((50, 90), "Supplier Name: Nobody Industries Ltd")
+    page.insert_text((50, 108), "Batch No: B-1001")
+    page.insert_text((50, 150), "Parameter")
+    page.insert_text((300, 150), "Result")
+    for i, (name, result) in enumerate([("Moisture", "3.1 %"), ("Protein", "80.2 %"), ("Fat", "1.4 %"),
+                                        ("Ash", "4.0 %"), ("pH", "6.8"), ("Bulk density", "0.45 g/ml")]):
+        page.insert_text((50, 170 + 18 * i), name)
+        page.insert_text((300, 170 + 18 * i), result)
+    page.insert_text((50, 300), "This certificate is issued on the basis of the analysis of a representative sample "
+                                "of the batch named above.")
+    path = tmp_path / "unknown.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_no_parser_read_is_not_trusted(unknown_supplier_pdf, monkeypatch):
+    monkeypatch.setattr(local_extract, "ENABLED", True)
+
+    local = local_extract.extract(unknown_supplier_pdf)
+
+    # Every structural signal is there, but no parser vouches for the values
+    assert local["content"]["product_name"] == "Widget Concentrate"
+    assert local["content"]["company_name"] == "Nobody Industries Ltd"
+    assert local["content"]["moisture_result"] == "3.1 %"
+    assert 0 < local["confidence"] < local_extract.MIN_CONFIDENCE
+    assert local_extract.maybe_extract(unknown_supplier_pdf) is None
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+import nanoNets
+import ocr_cache
+import results_store
+from conftest import COA_PDF
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """nanoNets writing its JSON under tmp_path; returns a helper pointing it at a stub."""
+    monkeypatch.setattr(nanoNets, "json_dir", str(tmp_path / "output"))
+
+    def use(url):
+        monkeypatch.setattr(nanoNets, "URL", url)
+    return use
+
+def test_http_error_counts_as_failure(stub, stub_stats, batch):
+    url = stub(error_rate=1, error_statuses="500")
+    batch(url)
+
+    ok, _ = nanoNets.timed_process(COA_PDF, None)
+
+    assert ok is False
+    # Every attempt was made and none of the error bodies was kept as OCR data
+    assert stub_stats(url)["errors"] == nanoNets.ocr_resilience.policy.max_attempts
+    assert not os.path.exists(nanoNets.output_path_for(COA_PDF))
+    assert ocr_cache.get(ocr_cache.cache_key(ocr_cache.file_digest(COA_PDF))) is None
+    assert results_store.query() == []
+
+def test_rate_limited_counts_as_failure(stub, batch):
+    batch(stub(error_rate=1, error_statuses="429"))
+    assert nanoNets.process_pdf(COA_PDF) is False
+
+def test_success(stub, batch):
+    batch(stub())
+    assert nanoNets.process_pdf(COA_PDF) is True
+    assert os.path.exists(nanoNets.output_path_for(COA_PDF))
@@ -0,0 +1,45 @@
+import os
+
+from fastapi.testclient import TestClient
+
+import ocr_cache
+from conftest import COA_PDF
+
+def upload(client):
+    with open(COA_PDF, "rb") as f:
+        return client.post("/upload-pdf/", files={"file": (os.path.basename(COA_PDF), f, "application/pdf")}).json()
+
+def test_second_upload_is_a_cache_hit(stub, stub_stats, api):
+    url = stub()
+    with TestClient(api(url)) as client:
+        first, second = upload(client), upload(client)
+
+    assert (first["success"], first["ocrCache"], first["ocrBackend"]) == (True, "miss", "nanonets")
+    assert (second["success"], second["ocrCache"], second["ocrBackend"]) == (True, "hit", "cache")
+    assert stub_stats(url)["requests"] == 1
+    assert second["data"] == first["data"]
+
+def test_http_errors_are_not_cached(stub, api):
+    with TestClient(api(stub(error_rate=1, error_statuses="500"))) as client:
+        assert upload(client)["success"] is False
+    assert ocr_cache.get(ocr_cache.cache_key(ocr_cache.file_digest(COA_PDF))) is None
+
+def test_eviction_is_throttled(monkeypatch):
+    scans = []
+    monkeypatch.setattr(ocr_cache, "evict", lambda: scans.append(1))
+    monkeypatch.setattr(ocr_cache, "EVICT_EVERY", 10)
+    monkeypatch.setattr(ocr_cache, "EVICT_INTERVAL", 3600)
+    monkeypatch.setattr(ocr_cache, "_puts_since_evict", 0)
+    monkeypatch.setattr(ocr_cache, "_last_evict", 0.0)
+
+    for i in range(25):
+        ocr_cache.put(f"key{i}", {"content": {}})
+
+    # The first put (no sweep yet this hour) and every tenth after it
+    assert len(scans) == 3
+    assert ocr_cache.get("key24") == {"content": {}}
+
+def test_expired_entries_are_misses(monkeypatch):
+    ocr_cache.put("old", {"content": {}})
+    monkeypatch.setattr(ocr_cache, "MAX_AGE", -1)
+    assert ocr_cache.get("old") is None
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ocr_resilience
+from conftest import COA_PDF
+
+def upload(client):
+    with open(COA_PDF, "rb") as f:
+        return client.post("/upload-pdf/", files={"file": (os.path.basename(COA_PDF), f, "application/pdf")})
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A breaker that opens after two failed attempts and allows a trial after a second."""
+    policy = ocr_resilience.Policy(max_attempts=2, retry_base=0.01, hedge=False,
+                                   breaker=ocr_resilience.CircuitBreaker(failures=2, reset=1.0))
+    monkeypatch.setattr(ocr_resilience, "policy", policy)
+    return policy.breaker
+
+def test_open_circuit_queues_a_job_that_runs_on_recovery(stub, stub_stats, api, breaker, monkeypatch):
+    import ocr_client
+
+    failing = stub(error_rate=1, error_statuses="503")
+    with TestClient(api(failing)) as client:
+        # Retries run out against the failing upstream and open the circuit
+        first = upload(client).json()
+        assert first["success"] is False and "Nanonets API error" in first["error"]
+        assert breaker.state == ocr_resilience.OPEN
+        assert stub_stats(failing)["requests"] == 2
+
+        # While open, uploads are not attempted but kept as jobs
+        response = upload(client)
+        assert response.status_code == 202
+        body = response.json()
+        assert body["status"] == "queued" and body["jobId"]
+        assert stub_stats(failing)["requests"] == 2
+
+        # Nanonets recovers; the job's retry is the half-open trial
+        monkeypatch.setattr(ocr_client, "NANONETS_URL", stub())
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            job = client.get(f"/jobs/{body['jobId']}").json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.1)
+
+    assert job["status"] == "done", job
+    assert job["result"]["success"] is True
+    assert breaker.state == ocr_resilience.CLOSED
+
+def test_open_circuit_without_job_workers_is_503(stub, api, breaker):
+    client = TestClient(api(stub(error_rate=1, error_statuses="503")))
+    upload(client)
+
+    response = upload(client)
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+@pytest.mark.parametrize("retry_after, header", [(0.0, "1"), (0.2, "1"), (1.2, "2"), (3.0, "3")])
+def test_retry_after_header_rounds_up(retry_after, header):
+    assert ocr_resilience.CircuitOpenError(retry_after).retry_after_header == header
+
+def test_retries_recover_from_transient_errors(stub, stub_stats, api, monkeypatch):
+    monkeypatch.setattr(ocr_resilience, "policy", ocr_resilience.Policy(max_attempts=5, retry_base=0.01, hedge=False))
+    url = stub(error_rate=0.5, seed=4)
+    with TestClient(api(url)) as client:
+        result = upload(client).json()
+
+    stats = stub_stats(url)
+    assert result["success"] is True
+    # Every attempt before the one that succeeded was an injected error
+    assert stats["errors"] >= 1
+    assert stats["requests"] == stats["errors"] + 1
+
+def test_half_open_allows_a_single_trial():
+    breaker = ocr_resilience.CircuitBreaker(failures=1, reset=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == ocr_resilience.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == ocr_resilience.CLOSED and breaker.allow()
+
+class _Response:
+    status_code = 200
+    headers = {}
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """A hedging policy that has seen enough fast calls to hedge anything slower than 10ms."""
+    monkeypatch.setattr(ocr_resilience, "HEDGE_MIN_DELAY", 0.01)
+    policy = ocr_resilience.Policy(retry_base=0.01, hedge=True, hedge_max_ratio=1.0,
+                                   breaker=ocr_resilience.CircuitBreaker(failures=1, reset=0.05))
+    policy._latencies.extend([0.001] * ocr_resilience.HEDGE_MIN_SAMPLES)
+    policy._calls = ocr_resilience.HEDGE_MIN_SAMPLES
+    return policy
+
+def _call(policy, mode, send):
+    """Run send() through the threaded or async policy entry point."""
+    if mode == "threaded":
+        return policy.call(send)
+
+    async def send_async():
+        return await asyncio.to_thread(send)
+    return asyncio.run(policy.call_async(send_async))
+
+def _slow_sends(on_first=None):
+    """A send() answering in 0.2s; returns it and the list of calls made."""
+    calls = []
+
+    def send():
+        calls.append(1)
+        if len(calls) == 1 and on_first:
+            on_first()
+        time.sleep(0.2)
+        return _Response()
+    return send, calls
+
+@pytest.mark.parametrize("mode", ["threaded", "async"])
+def test_slow_call_is_hedged_and_counted_once(hedging, mode):
+    send, calls = _slow_sends()
+
+    _call(hedging, mode, send)
+
+    assert len(calls) == 2
+    assert hedging._calls == ocr_resilience.HEDGE_MIN_SAMPLES + 1
+    assert hedging._hedge_count == 1
+
+@pytest.mark.parametrize("mode", ["threaded", "async"])
+def test_half_open_trial_is_not_hedged(hedging, mode):
+    hedging.breaker.record_failure()
+    time.sleep(0.06)
+    send, calls = _slow_sends()
+
+    _call(hedging, mode, send)
+
+    assert len(calls) == 1
+    assert hedging._hedge_count == 0
+    assert hedging.breaker.state == ocr_resilience.CLOSED
+
+@pytest.mark.parametrize("mode", ["threaded", "async"])
+def test_no_hedge_once_the_circuit_opens(hedging, mode):
+    # Another caller's failure opens the circuit while this call is pending
+    send, calls = _slow_sends(on_first=hedging.breaker.record_failure)
+
+    _call(hedging, mode, send)
+
+    assert len(calls) == 1
+    assert hedging._hedge_count == 0
@@ -0,0 +1,49 @@
+import os
+import shutil
+import time
+
+import pytest
+
+import nanoNets
+import pdf_watch
+import results_store
+from conftest import COA_PDF
+
+def _watch_until(directory, url, monkeypatch, subdir):
+    """Run nanoNets' watch handler over directory until a PDF lands in subdir; returns its listing."""
+    monkeypatch.setattr(nanoNets, "URL", url)
+    watcher = pdf_watch.PdfWatcher(str(directory), lambda path: nanoNets.timed_process(path, None)[0], debounce=0.05)
+    watcher.start()
+    try:
+        shutil.copy(COA_PDF, directory)
+        target = directory / subdir
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            if target.is_dir() and os.listdir(target):
+                return os.listdir(target)
+            time.sleep(0.05)
+        pytest.fail(f"nothing moved to {subdir}/")
+    finally:
+        watcher.stop()
+
+def test_rejected_pdf_moves_to_failed(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(nanoNets, "json_dir", str(tmp_path / "output"))
+    watched = tmp_path / "pdf"
+    watched.mkdir()
+
+    moved = _watch_until(watched, stub(error_rate=1, error_statuses="503"), monkeypatch, pdf_watch.FAILED_DIRNAME)
+
+    assert moved == [os.path.basename(COA_PDF)]
+    assert not (watched / pdf_watch.PROCESSED_DIRNAME).exists()
+    assert not [name for name in os.listdir(watched) if name.endswith(".pdf")]
+    assert results_store.query() == []
+
+def test_processed_pdf_moves_to_processed(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(nanoNets, "json_dir", str(tmp_path / "output"))
+    watched = tmp_path / "pdf"
+    watched.mkdir()
+
+    moved = _watch_until(watched, stub(), monkeypatch, pdf_watch.PROCESSED_DIRNAME)
+
+    assert moved == [os.path.basename(COA_PDF)]
+    assert not (watched / pdf_watch.FAILED_DIRNAME).exists()
@@ -0,0 +1,23 @@
+import os
+
+from fastapi.testclient import TestClient
+
+import results_store
+from conftest import COA_PDF
+
+def test_results_without_lifespan_events(stub, api, tmp_path, monkeypatch):
+    # A database nothing has initialised, as on a host that sends no lifespan events
+    monkeypatch.setattr(results_store, "RESULTS_DB", str(tmp_path / "fresh" / "results.sqlite3"))
+    client = TestClient(api(stub()))
+
+    response = client.get("/results/")
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
+
+    with open(COA_PDF, "rb") as f:
+        uploaded = client.post("/upload-pdf/", files={"file": (os.path.basename(COA_PDF), f, "application/pdf")}).json()
+    assert uploaded["success"] is True and uploaded["resultId"]
+
+    results = client.get("/results/").json()["results"]
+    assert [result["id"] for result in results] == [uploaded["resultId"]]
+    assert client.get(f"/results/{uploaded['resultId']}").status_code == 200
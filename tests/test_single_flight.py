@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+import single_flight
+
+def test_followers_survive_leader_cancellation():
+    async def scenario():
+        group = single_flight.Group()
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        leader = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(group.do("key", work))
+        await asyncio.sleep(0)
+
+        # The leader's client goes away while the work is in flight
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == ("result", True)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert calls == [1]
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        group = single_flight.Group()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad PDF")
+
+        results = await asyncio.gather(group.do("key", work), group.do("key", work), return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError, ValueError]
+        assert group.in_flight() == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from conftest import COA_PDF
+
+def upload(client, path=COA_PDF, **kwargs):
+    with open(path, "rb") as f:
+        return client.post("/upload-pdf/", files={"file": (os.path.basename(path), f, "application/pdf")}, **kwargs)
+
+def test_upload_without_lifespan_events(stub, api, tmp_path):
+    # Not used as a context manager: no startup hooks run, as on a serverless bridge
+    client = TestClient(api(stub()))
+
+    response = upload(client)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True, body
+    assert os.listdir(tmp_path / "json")
@@ -0,0 +1,79 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import uploads
+
+PDF_SIZE = 100_000
+
+def fake_pdf(n):
+    """A PDF-looking body of PDF_SIZE bytes; the stub answers unknown PDFs with its default recording."""
+    head = f"%PDF-1.4 test {n}\n".encode()
+    return head + b"\0" * (PDF_SIZE - len(head))
+
+def chunked(body, size=64 * 1024):
+    # No Content-Length, so the middleware's up-front check cannot apply
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+def post_batch(client, parts):
+    boundary = "testboundary"
+    body = b"".join(
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{name}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n".encode() + data + b"\r\n"
+        for name, data, content_type in parts
+    ) + f"--{boundary}--\r\n".encode()
+    response = client.post("/upload-batch/", content=chunked(body),
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    return response.status_code, [json.loads(line) for line in response.text.splitlines() if line]
+
+def outcome(lines):
+    documents = sorted((line for line in lines if "index" in line), key=lambda line: line["index"])
+    return [(line["filename"], line["success"]) for line in documents], lines[-1]["summary"]
+
+@pytest.fixture
+def batch_limits(monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_BATCH_BYTES", int(2.5 * PDF_SIZE))
+    monkeypatch.setattr(uploads, "MAX_BATCH_FILES", 10)
+
+def test_plain_pdfs_share_the_batch_budget(stub, api, batch_limits):
+    with TestClient(api(stub())) as client:
+        status, lines = post_batch(client, [(f"{n}.pdf", fake_pdf(n), "application/pdf") for n in range(3)])
+
+    assert status == 200
+    documents, summary = outcome(lines)
+    assert documents == [("0.pdf", True), ("1.pdf", True), ("2.pdf", False)]
+    assert "too large" in lines[[line.get("index") for line in lines].index(2)]["error"]
+    assert (summary["total"], summary["succeeded"]) == (3, 2)
+
+def test_zip_entries_share_the_batch_budget(stub, api, batch_limits):
+    bundle = io.BytesIO()
+    with zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED) as z:
+        for n in range(2):
+            z.writestr(f"zipped{n}.pdf", fake_pdf(n))
+
+    with TestClient(api(stub())) as client:
+        # The plain PDF leaves room for one zipped PDF only
+        status, lines = post_batch(client, [("plain.pdf", fake_pdf(9), "application/pdf"),
+                                            ("bundle.zip", bundle.getvalue(), "application/zip")])
+
+    assert status == 200
+    documents, summary = outcome(lines)
+    assert sorted(documents) == [("plain.pdf", True), ("zipped0.pdf", True), ("zipped1.pdf", False)]
+
+def test_file_count_limit(stub, api, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_BATCH_FILES", 2)
+    with TestClient(api(stub())) as client:
+        status, lines = post_batch(client, [(f"{n}.pdf", fake_pdf(n), "application/pdf") for n in range(3)])
+
+    documents, _ = outcome(lines)
+    assert documents == [("0.pdf", True), ("1.pdf", True), ("2.pdf", False)]
+
+def test_oversized_zip_is_rejected(stub, api, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_BATCH_BYTES", 1000)
+    with TestClient(api(stub())) as client:
+        status, lines = post_batch(client, [("bundle.zip", fake_pdf(0), "application/zip")])
+    assert status == 413
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+
+# === CONFIG ===
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "uploads"))
+CHUNK_SIZE = 64 * 1024
+
+# /upload-batch/: the whole request (or ZIP) and the number of PDFs in it;
+# each PDF inside is still held to MAX_UPLOAD_BYTES
+MAX_BATCH_BYTES = int(os.environ.get("MAX_BATCH_BYTES", str(200 * 1024 * 1024)))
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "100"))
+
+# Allowance for multipart boundaries and form fields around the PDF itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+def content_length_too_large(headers, max_bytes=MAX_UPLOAD_BYTES):
+    """True when the declared request size already rules the upload out."""
+    try:
+        return int(headers.get("content-length", 0)) > max_bytes + MULTIPART_OVERHEAD
+    except ValueError:
+        return False
+
+async def spool_upload(file, max_bytes=MAX_UPLOAD_BYTES, suffix=".pdf"):
+    """
+    Copy an UploadFile to a temp file in fixed-size chunks.
+    Returns (path, size, sha256 hex digest); the caller removes the file.
+    Raises UploadTooLarge as soon as more than max_bytes have been read.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(f"File is {file.size} bytes, limit is {max_bytes} bytes")
+
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=SPOOL_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        remove_spooled(path)
+        raise
+    return path, size, digest.hexdigest()
+
+def remove_spooled(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# === ZIP BUNDLES ===
+def is_zip(filename, content_type=None):
+    return (filename or "").lower().endswith(".zip") or content_type in ("application/zip", "application/x-zip-compressed")
+
+def _skipped(name):
+    """Directories and archiver metadata (__MACOSX/, dotfiles) inside a ZIP."""
+    base = os.path.basename(name)
+    return name.endswith("/") or name.startswith("__MACOSX/") or not base or base.startswith(".")
+
+def spool_zip(zip_path, max_bytes=MAX_UPLOAD_BYTES, max_total=MAX_BATCH_BYTES, max_files=MAX_BATCH_FILES):
+    """
+    Spool every PDF in a ZIP to its own temp file, like spool_upload.
+    Returns one dict per entry: filename plus pdf_path/size/pdf_digest, or
+    error for entries that are not PDFs or are over the limits. The caller
+    removes the spooled files. Raises zipfile.BadZipFile for a corrupt ZIP.
+    """
+    entries, total, pdfs = [], 0, 0
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    try:
+        with zipfile.ZipFile(zip_path) as bundle:
+            for info in bundle.infolist():
+                if _skipped(info.filename):
+                    continue
+                filename = os.path.basename(info.filename)
+                if not filename.lower().endswith(".pdf"):
+                    entries.append({"filename": filename, "error": "Not a PDF"})
+                    continue
+                if pdfs >= max_files:
+                    entries.append({"filename": filename, "error": f"Batch is limited to {max_files} PDFs"})
+                    continue
+                # Declared sizes bound what ZipFile will decompress, so this also stops ZIP bombs
+                if info.file_size > max_bytes or total + info.file_size > max_total:
+                    entries.append({"filename": filename, "error": f"File too large: {info.file_size} bytes "
+                                                                  f"(limits: {max_bytes} per PDF, {max_total} per batch)"})
+                    continue
+                fd, path = tempfile.mkstemp(suffix=".pdf", dir=SPOOL_DIR)
+                digest = hashlib.sha256()
+                try:
+                    with os.fdopen(fd, "wb") as out, bundle.open(info) as src:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            digest.update(chunk)
+                            out.write(chunk)
+                except zipfile.BadZipFile as e:
+                    remove_spooled(path)
+                    entries.append({"filename": filename, "error": f"Corrupt ZIP entry: {e}"})
+                    continue
+                except BaseException:
+                    remove_spooled(path)
+                    raise
+                pdfs, total = pdfs + 1, total + info.file_size
+                entries.append({"filename": filename, "pdf_path": path, "size": info.file_size, "pdf_digest": digest.hexdigest()})
+    except BaseException:
+        for entry in entries:
+            if "pdf_path" in entry:
+                remove_spooled(entry["pdf_path"])
+        raise
+    return entries